@@ -0,0 +1,305 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DOWNLOAD, DOWNLOAD_PATH_KEY, METRICS_PATH_KEY, cli
+from main import loadConfig, probePath, setLibrary
+from utility import search, download, library, metrics, probe, relocate, scheduler, transcode, urls
+
+
+class Item:
+
+    """
+    One line of the batch input and its outcome
+    :param line: The url, playlist url or search term
+    """
+
+    __slots__ = (
+        'line',
+        'query',
+        'title',
+        'error'
+    )
+
+    def __init__(self, line: str) -> None:
+        self.line = line
+        self.query = None  # The video a search term was resolved to up front, see resolve
+        self.title = None
+        self.error = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def read_lines(source: str) -> list[str]:
+    """Reads the urls/queries from a file or stdin ('-'), skipping empty lines and # comments"""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as file:
+            lines = file.read().splitlines()
+
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+def run_item(
+        item: Item, video: bool, playlist_workers: int, audio: transcode.AudioTarget = None, sync: bool = False,
+        prune: bool = False, directory: str = None, progress_hook=None, refresh: bool = False
+) -> Item:
+    """Downloads one item without any prompt into directory (the current one by default), playlists are synced if sync"""
+    try:
+        if search.is_playlist(item.line):
+            playlist = download.DownloadPlaylist(
+                item.line, video, workers=playlist_workers, progress_hook=progress_hook, audio=audio, directory=directory
+            )
+            item.title = playlist.title
+            results = playlist.sync(prune, refresh) if sync else playlist.download()
+            failed = [e for e in results if not e.ok]
+            if failed:
+                item.error = f"{len(failed)} of {len(playlist.results)} entries failed"
+            return item
+
+        if search.is_url(item.line):
+            q = search.SearchWithUrl(item.line).video
+        elif item.query is not None:
+            q = item.query
+        else:
+            queries = search.Search(item.line, amount=1).queries
+            if not queries:
+                item.error = "No results"
+                return item
+            q = queries[0]
+
+        item.title = q.title
+        d = download.Download(q.url, q.title, video, progress_hook=progress_hook, audio=audio, directory=directory)
+        if d.error is not None:
+            item.error = repr(d.error)
+    except PermissionError:
+        item.error = "Operation not permitted"
+    except Exception as e:
+        item.error = repr(e)
+
+    return item
+
+
+def resolve(items: list[Item]) -> list[Item]:
+    """
+    Searches the search terms of the items all at once, each one gets the video it found as its query
+    :return: The items left to download, a term whose video a url or an earlier term already gives is dropped
+    """
+    import asyncio
+
+    terms = [item.line for item in items if not search.is_url(item.line) and not search.is_playlist(item.line)]
+    if not terms:
+        return items
+
+    found = {}
+
+    async def collect() -> None:
+        # Every term keeps its own result, the duplicates are dropped below in the order of the lines
+        async for q in search.search_many(terms, amount=1, unique=False):
+            found.setdefault(q.keyword, q)
+
+    asyncio.run(collect())
+
+    seen = {
+        search.video_id(item.line) for item in items if search.is_url(item.line) and not search.is_playlist(item.line)
+    }
+    left = []
+    for item in items:
+        if item.line in found:
+            item.query = found[item.line]
+            if item.query.id in seen:
+                continue
+            seen.add(item.query.id)
+        elif item.line in terms:
+            item.error = "No results"
+        left.append(item)
+    return left
+
+
+def work_directory(destination: str):
+    """
+    Where the downloads for destination go: destination itself, or a temp folder if the probe says so
+    :return: The directory, None if nothing can be written anywhere
+    """
+    caps = probePath(destination)
+    if caps.strategy == probe.DIRECT:
+        work_dir = destination
+    elif caps.temp_parent is not None:
+        work_dir = os.path.join(caps.temp_parent, f".temp_{random.randint(0, 100000000000)}")
+        cli.root(f"Unable to write into {destination} directly, downloading in {work_dir} ({caps.strategy})")
+    else:
+        cli.error(f"Unable to write into {destination}: {caps!r}")
+        return None
+
+    os.makedirs(work_dir, exist_ok=True)
+    if work_dir != destination:
+        # Downloads are only admitted if they fit into both, the journal and manifests record the destination
+        relocate.route(work_dir, destination)
+    return work_dir
+
+
+def settle(work_dir: str, destination: str) -> int:
+    """Moves everything of a temp work_dir into destination, returns how many files are left behind"""
+    if work_dir == destination:
+        return 0
+    relocate.unroute(work_dir)
+
+    leftovers = 0
+    for root, _, files in os.walk(work_dir):
+        target = os.path.normpath(os.path.join(destination, os.path.relpath(root, work_dir)))
+        for file, result in relocate.relocate_all([os.path.join(root, f) for f in files], target).items():
+            if isinstance(result, Exception):
+                leftovers += 1
+                cli.error(f"Unable to move {file}: {repr(result)}")
+    if leftovers:
+        cli.info(f"{leftovers} file(s) are still saved in: {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return leftovers
+
+
+def parse_rate(value: str) -> float:
+    """'500K', '2M', '1.5G' or plain bytes per second"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B')
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Downloads every url, playlist url or search term (one per line) without any prompt"
+    )
+    parser.add_argument('source', nargs='?', default='-', help="File with one item per line, '-' for stdin")
+
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('-v', '--video', action='store_true', help="Download videos")
+    mode.add_argument('-a', '--audio', action='store_true', help="Download audio (default)")
+
+    parser.add_argument('-o', '--output', default=None, help="Destination directory (default: configured path)")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="Items downloaded at the same time")
+    parser.add_argument(
+        '-p', '--playlist-workers', type=int, default=download.PLAYLIST_WORKERS,
+        help="Entries of a playlist downloaded at the same time"
+    )
+    parser.add_argument(
+        '-r', '--limit-rate', type=parse_rate, default=None,
+        help="Bandwidth shared by all downloads in bytes per second, e.g. 2M"
+    )
+    parser.add_argument(
+        '--per-host', type=int, default=scheduler.SCHEDULER.per_host,
+        help="Connections open at the same time against one host"
+    )
+    parser.add_argument(
+        '-c', '--connections', type=int, default=scheduler.SCHEDULER.connections,
+        help="Connections a large file is split over, as far as --per-host leaves room"
+    )
+    parser.add_argument(
+        '-s', '--sync', action='store_true',
+        help="Playlists only fetch the entries their folder doesn't have yet (tracked in its .manifest.json)"
+    )
+    parser.add_argument('--prune', action='store_true', help="With --sync, deletes entries removed from the playlist")
+    parser.add_argument(
+        '--refresh', action='store_true',
+        help="With --sync, extracts the entries the folder has again and downloads those whose formats changed"
+    )
+    parser.add_argument(
+        '-f', '--audio-format', choices=tuple(transcode.ENCODERS), default=None,
+        help="Transcodes the audio (streamed into ffmpeg, no intermediate file) instead of keeping the container"
+    )
+    parser.add_argument('-b', '--audio-bitrate', default='192k', help="Bitrate of the transcoded audio")
+    parser.add_argument('-n', '--normalize', action='store_true', help="Normalizes the loudness of the audio")
+    parser.add_argument(
+        '-t', '--transcoders', type=int, default=transcode.TRANSCODE_WORKERS,
+        help="ffmpeg processes running at the same time"
+    )
+    parser.add_argument(
+        '-d', '--duplicates', choices=library.MODES, default=None,
+        help="What is done with a video the library (every folder under the destination) already has"
+    )
+    parser.add_argument('--no-library', action='store_true', help="Downloads duplicates again")
+    parser.add_argument(
+        '--metrics', default=None,
+        help="Records per-stage timings: JSON lines, or a Prometheus text file if it ends with .prom"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] = None) -> int:
+    """Batch execution starts here, returns the exit code"""
+    args = parse_args(argv)
+
+    scheduler.SCHEDULER.rate = args.limit_rate
+    scheduler.SCHEDULER.per_host = max(1, args.per_host)
+    scheduler.SCHEDULER.connections = max(1, args.connections)
+    scheduler.SCHEDULER.max_active = max(1, args.jobs, args.playlist_workers)
+
+    audio = None
+    if args.audio_format and not args.video:
+        if not transcode.available():
+            cli.error(f"--audio-format needs ffmpeg, '{transcode.FFMPEG}' was not found!")
+            return 2
+        audio = transcode.AudioTarget(args.audio_format, args.audio_bitrate, args.normalize)
+        transcode.TRANSCODER.workers = max(1, args.transcoders)
+
+    metrics_path = args.metrics or loadConfig().get(METRICS_PATH_KEY)
+    if metrics_path:
+        metrics.SINK = metrics.Recorder(os.path.abspath(os.path.expanduser(metrics_path)))
+
+    lines = read_lines(args.source)
+    # Normalized (canonical urls) and deduplicated, the same video given twice is downloaded once
+    items = [Item(u.url or u.text) for u in urls.classify_many(lines)]
+    if len(items) < len(lines):
+        cli.info(f"{len(lines) - len(items)} duplicate line(s) skipped")
+    if not items:
+        cli.error("Nothing to download!")
+        return 2
+
+    searched = len(items)
+    items = resolve(items)
+    if len(items) < searched:
+        cli.info(f"{searched - len(items)} search(es) skipped, another line gives the same video")
+
+    destination = os.path.abspath(os.path.expanduser(args.output or loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD)))
+    if args.no_library:
+        download.LIBRARY = None
+    else:
+        setLibrary(destination, args.duplicates)
+
+    # Decided before anything is downloaded: straight into the destination or through a temp folder
+    work_dir = work_directory(destination)
+    if work_dir is None:
+        return 2
+    os.chdir(work_dir)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="Batch") as pool:
+        # Search terms that found nothing have failed already
+        list(pool.map(
+            lambda i: run_item(i, args.video, args.playlist_workers, audio, args.sync, args.prune,
+                               refresh=args.refresh), [item for item in items if item.ok]
+        ))
+
+    if work_dir != destination:
+        os.chdir(destination)
+        settle(work_dir, destination)
+
+    for item in items:
+        if item.ok:
+            cli.success(f"{item.line}: {item.title}")
+        else:
+            cli.error(f"{item.line}: {item.error}")
+
+    failed = sum(not item.ok for item in items)
+    cli.info(f"{len(items) - failed} of {len(items)} downloaded in {destination}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Guards the cold start: importing an entry point must stay under a time budget and must not
+import the heavy modules (yt_dlp, youtube_search...) or probe for su.
+
+    python benchmarks/import_time.py [--budget-ms 150] [--runs 5]
+
+Prints a JSON report and exits with 1 on a regression.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.split(os.path.split(os.path.abspath(__file__))[0])[0]
+ENTRY_POINTS = ('main', 'batch')
+LAZY_MODULES = ('yt_dlp', 'youtube_search', 'requests', 'asyncio')
+
+SNIPPET = """
+import json, sys
+import {module}
+import config
+print(json.dumps({{
+    'loaded': [m for m in {lazy!r} if m in sys.modules],
+    'su_probed': config.has_su.cache_info().currsize > 0
+}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Imports module in a fresh interpreter, returns its cumulative import time and what it loaded"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SNIPPET.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    micros = None
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            micros = int(parts[1])
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['ms'] = micros / 1000 if micros is not None else None
+    return result
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time regression guard")
+    parser.add_argument('--budget-ms', type=float, default=150, help="Max cumulative import time per entry point")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per entry point (best is kept)")
+    args = parser.parse_args(argv)
+
+    report, failed = {}, False
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(max(1, args.runs))]
+        best = min((r for r in runs if r['ms'] is not None), key=lambda r: r['ms'], default=runs[0])
+        best['ok'] = bool(best['ms'] is not None and best['ms'] <= args.budget_ms
+                          and not best['loaded'] and not best['su_probed'])
+        failed = failed or not best['ok']
+        report[module] = best
+
+    print(json.dumps({'budget_ms': args.budget_ms, 'entry_points': report}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
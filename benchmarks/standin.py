@@ -0,0 +1,215 @@
+"""
+A local stand-in for YouTube: serves synthetic search results, watch pages, playlist pages and
+media bytes, so the download paths can be measured without the network.
+
+The watch/playlist urls stay youtube.com urls, the StandIn extractors in
+benchmarks/yt_dlp_plugins take them over while STANDIN_ENV points at a running StandIn.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STANDIN_ENV = 'YTD_STANDIN_URL'
+BLOCK = os.urandom(1024 * 1024)  # Media bytes are this block repeated
+WRITE_SIZE = 256 * 1024
+
+MUXED_ITAG = 18
+AUDIO_ITAG = 140
+PLAYLIST_PAGE = 100  # Playlist entries per page, the rest follow as continuations like on YouTube
+
+
+def video_ids(count: int) -> list[str]:
+    """The (11 character) ids of the synthetic videos"""
+    return [f"bench{n:06d}" for n in range(count)]
+
+
+def watch_url(v_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={v_id}"
+
+
+def playlist_url(p_id: str = 'PLbench') -> str:
+    return f"https://www.youtube.com/playlist?list={p_id}"
+
+
+class StandIn:
+
+    """
+    The stand-in server, runs on a thread until stopped
+    :param videos: Number of synthetic videos (search results and playlist entries)
+    :param size: Bytes of the muxed format of every video, the audio format is a quarter of it
+    :param latency: Seconds every response is held back (simulated round trip)
+    """
+
+    def __init__(self, videos: int = 8, size: int = 8 * 1024 * 1024, latency: float = 0.0) -> None:
+        self.videos = video_ids(videos)
+        self.size = size
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandIn':
+        handler = type('StandInHandler', (_Handler,), {'standin': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="StandIn", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    # Pages, shaped like the JSON YouTube embeds in its html
+
+    def _media_url(self, v_id: str, itag: int) -> str:
+        return f"{self.url}/videoplayback?id={v_id}&itag={itag}"
+
+    def media_size(self, itag: int) -> int:
+        return self.size if itag == MUXED_ITAG else max(1, self.size // 4)
+
+    def player_response(self, v_id: str) -> dict:
+        return {
+            'videoDetails': {
+                'videoId': v_id,
+                'title': f"Benchmark video {v_id}",
+                'lengthSeconds': '212',
+                'author': 'Benchmark',
+                'viewCount': '1000'
+            },
+            'streamingData': {
+                'formats': [{
+                    'itag': MUXED_ITAG,
+                    'url': self._media_url(v_id, MUXED_ITAG),
+                    'mimeType': 'video/mp4; codecs="avc1.42001E, mp4a.40.2"',
+                    'bitrate': 500000,
+                    'width': 640,
+                    'height': 360,
+                    'contentLength': str(self.media_size(MUXED_ITAG))
+                }],
+                'adaptiveFormats': [{
+                    'itag': AUDIO_ITAG,
+                    'url': self._media_url(v_id, AUDIO_ITAG),
+                    'mimeType': 'audio/mp4; codecs="mp4a.40.2"',
+                    'bitrate': 130000,
+                    'contentLength': str(self.media_size(AUDIO_ITAG))
+                }]
+            }
+        }
+
+    def search_data(self) -> dict:
+        renderers = [{
+            'videoRenderer': {
+                'videoId': v_id,
+                'thumbnail': {'thumbnails': [{'url': f"{self.url}/vi/{v_id}/default.jpg"}]},
+                'title': {'runs': [{'text': f"Benchmark video {v_id}"}]},
+                'longBylineText': {'runs': [{'text': 'Benchmark'}]},
+                'lengthText': {'simpleText': '3:32'},
+                'viewCountText': {'simpleText': '1,000 views'},
+                'navigationEndpoint': {'commandMetadata': {'webCommandMetadata': {'url': f"/watch?v={v_id}"}}}
+            }
+        } for v_id in self.videos]
+        return {'contents': {'twoColumnSearchResultsRenderer': {'primaryContents': {'sectionListRenderer': {
+            'contents': [{'itemSectionRenderer': {'contents': renderers}}]
+        }}}}}
+
+    def playlist_data(self, p_id: str, page: int = 0) -> dict:
+        start = page * PLAYLIST_PAGE
+        videos = self.videos[start:start + PLAYLIST_PAGE]
+        return {
+            'id': p_id,
+            'title': f"Benchmark playlist {p_id}",
+            'count': len(self.videos),
+            'videos': [{'videoId': v_id, 'title': f"Benchmark video {v_id}"} for v_id in videos],
+            'continuation': page + 1 if start + PLAYLIST_PAGE < len(self.videos) else None
+        }
+
+
+def _page(var: str, data: dict) -> bytes:
+    return f"<html><body><script>var {var} = {json.dumps(data)};</script></body></html>".encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    standin: StandIn = None
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so reused connections show up in the numbers
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.standin.count()
+        if self.standin.latency:
+            time.sleep(self.standin.latency)
+
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        if parts.path == '/results':
+            self._send(_page('ytInitialData', self.standin.search_data()))
+        elif parts.path == '/watch' and query.get('v'):
+            self._send(_page('ytInitialPlayerResponse', self.standin.player_response(query['v'])))
+        elif parts.path == '/playlist' and query.get('list'):
+            page = int(query['page']) if query.get('page', '').isdigit() else 0
+            self._send(_page('ytInitialData', self.standin.playlist_data(query['list'], page)))
+        elif parts.path == '/videoplayback' and query.get('itag', '').isdigit():
+            self._media(self.standin.media_size(int(query['itag'])))
+        else:
+            self._send(b'Not Found', 404, 'text/plain')
+
+    def _send(self, body: bytes, status: int = 200, content_type: str = 'text/html; charset=utf-8') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _media(self, size: int) -> None:
+        start, end = 0, size - 1
+        ranged = self.headers.get('Range', '').startswith('bytes=')
+        if ranged:
+            first, _, last = self.headers['Range'][6:].partition('-')
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        self.send_response(206 if ranged else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if ranged:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        offset = start
+        while offset <= end:
+            pos = offset % len(BLOCK)
+            n = min(WRITE_SIZE, len(BLOCK) - pos, end - offset + 1)
+            self.wfile.write(BLOCK[pos:pos + n])
+            offset += n
@@ -0,0 +1,245 @@
+"""
+Measures Search, get_info, Download and DownloadPlaylist against a local stand-in YouTube
+(benchmarks/standin.py), every scenario in a fresh interpreter so caches and peak RSS don't leak.
+
+    python benchmarks/suite.py [--scenarios search,extract,download,playlist] [--output report.json]
+
+Prints (or writes) a JSON report to compare between releases.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS = os.path.split(os.path.abspath(__file__))[0]
+ROOT = os.path.split(BENCHMARKS)[0]
+SCENARIOS = ('search', 'extract', 'download', 'playlist')
+
+from standin import STANDIN_ENV, StandIn, playlist_url, video_ids, watch_url
+
+
+def summary(samples: list[float]) -> dict:
+    """Latency summary in milliseconds of samples in seconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        'runs': len(ms),
+        'min_ms': round(min(ms), 3),
+        'median_ms': round(statistics.median(ms), 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'max_ms': round(max(ms), 3)
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Timer:
+
+    """
+    Progress hook that notes when the first and the last byte arrived
+    :param start: When the measured call started (time.perf_counter)
+    """
+
+    __slots__ = (
+        'start',
+        'first_byte',
+        'finished',
+        'bytes'
+    )
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.first_byte = None
+        self.finished = None
+        self.bytes = {}  # filename -> bytes
+
+    def hook(self, d: dict) -> None:
+        now = time.perf_counter()
+        if d.get('status') == 'downloading' and d.get('downloaded_bytes'):
+            self.first_byte = self.first_byte or now
+        if d.get('status') in ('downloading', 'finished'):
+            self.bytes[d.get('filename')] = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        if d.get('status') == 'finished':
+            self.finished = now
+
+    def report(self) -> dict:
+        total = sum(self.bytes.values())
+        transfer = (self.finished - self.first_byte) if self.first_byte and self.finished else None
+        return {
+            'ttfb_ms': round((self.first_byte - self.start) * 1000, 3) if self.first_byte else None,
+            'bytes': total,
+            'throughput_mb_s': round(total / transfer / 1024 / 1024, 2) if transfer else None
+        }
+
+
+# Scenarios, each one runs in its own interpreter with the stand-in already listening
+
+def _search(args, base: str) -> dict:
+    import requests
+    import youtube_search
+    from types import SimpleNamespace
+    from utility.search import Search
+
+    # youtube_search only knows https://youtube.com, sends it to the stand-in instead
+    youtube_search.requests = SimpleNamespace(
+        get=lambda url, *a, **kw: requests.get(url.replace('https://youtube.com', base, 1), *a, **kw)
+    )
+
+    samples = []
+    for n in range(args.runs):
+        start = time.perf_counter()
+        Search(f"benchmark query {n}", amount=10)
+        samples.append(time.perf_counter() - start)
+    return {'latency': summary(samples)}
+
+
+def _extract(args, base: str) -> dict:
+    from utility.info import get_info
+
+    # Distinct ids, get_info only extracts an url once per session
+    samples = []
+    for v_id in video_ids(args.runs):
+        start = time.perf_counter()
+        get_info(watch_url(v_id))
+        samples.append(time.perf_counter() - start)
+    return {'latency': summary(samples), 'first_ms': round(samples[0] * 1000, 3)}
+
+
+def _download(args, base: str) -> dict:
+    from utility.download import Download
+
+    result = {}
+    for name, video in (('audio', False), ('video', True)):
+        start = time.perf_counter()
+        timer = Timer(start)
+        d = Download(watch_url(video_ids(2)[video]), f"bench_{name}", video=video, progress_hook=timer.hook)
+        result[name] = dict(timer.report(), seconds=round(time.perf_counter() - start, 3), ok=d.error is None)
+    return result
+
+
+def _playlist(args, base: str) -> dict:
+    from utility.download import DownloadPlaylist
+
+    start = time.perf_counter()
+    timer = Timer(start)
+    results = DownloadPlaylist(playlist_url(), video=False, workers=args.workers, progress_hook=timer.hook).download()
+    seconds = time.perf_counter() - start
+    return dict(
+        timer.report(),
+        seconds=round(seconds, 3),
+        entries=len(results),
+        ok=sum(e.ok for e in results),
+        workers=args.workers,
+        entries_per_s=round(len(results) / seconds, 2)
+    )
+
+
+RUNNERS = {'search': _search, 'extract': _extract, 'download': _download, 'playlist': _playlist}
+
+
+def child(args) -> int:
+    """Runs one scenario in a scratch directory, prints its JSON result"""
+    sys.path.insert(0, ROOT)
+    base = os.environ[STANDIN_ENV]
+    workdir = tempfile.mkdtemp(prefix='ytd_bench_')
+    os.chdir(workdir)
+    try:
+        result = RUNNERS[args.child](args, base)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+    return 0
+
+
+def run(scenario: str, args, standin: StandIn) -> dict:
+    argv = [sys.executable, os.path.abspath(__file__), '--child', scenario,
+            '--runs', str(args.runs), '--workers', str(args.workers)]
+    proc = subprocess.run(argv, env=dict(os.environ, **{STANDIN_ENV: standin.url}),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1:] or [f"exit code {proc.returncode}"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    import yt_dlp.version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks against a local stand-in YouTube")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma separated, any of " + ', '.join(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=5, help="Searches/extractions per scenario")
+    parser.add_argument('--size-mb', type=float, default=8, help="Size of every video, the audio is a quarter of it")
+    parser.add_argument('--entries', type=int, default=8, help="Videos of the playlist (and search results)")
+    parser.add_argument('--workers', type=int, default=8, help="Playlist workers")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Simulated round trip of every request")
+    parser.add_argument('-o', '--output', help="Writes the report to this file instead of printing it")
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.runs = max(1, args.runs)
+
+    if args.child:
+        return child(args)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    standin = StandIn(
+        videos=max(1, args.entries), size=int(args.size_mb * 1024 * 1024), latency=args.latency_ms / 1000
+    )
+    with standin:
+        results = {}
+        for scenario in scenarios:
+            before = standin.requests
+            results[scenario] = run(scenario, args, standin)
+            results[scenario]['requests'] = standin.requests - before
+
+    report = {
+        'environment': environment(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('child', 'output', 'scenarios')},
+        'results': results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    return 1 if any('error' in r for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+yt_dlp plugin extractors for benchmarks/standin.py, only active while YTD_STANDIN_URL is set.
+yt_dlp finds them because benchmarks/ is on sys.path when a benchmark runs.
+"""
+import os
+
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import int_or_none, mimetype2ext, parse_codecs
+
+STANDIN_ENV = 'YTD_STANDIN_URL'
+
+
+class _StandInBaseIE(InfoExtractor):
+
+    @classmethod
+    def suitable(cls, url):
+        return bool(os.environ.get(STANDIN_ENV)) and super().suitable(url)
+
+    def _standin(self, path: str) -> str:
+        return os.environ[STANDIN_ENV].rstrip('/') + path
+
+
+class StandInIE(_StandInBaseIE):
+    IE_NAME = 'standin'
+    _VALID_URL = r'https?://(?:www\.)?(?:youtube\.com/(?:watch\?v=|embed/|shorts/)|youtu\.be/)(?P<id>[\w-]+)(?!.*[?&]list=)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        webpage = self._download_webpage(self._standin(f'/watch?v={video_id}'), video_id)
+        player = self._search_json(r'var\s+ytInitialPlayerResponse\s*=', webpage, 'player response', video_id)
+        details = player['videoDetails']
+
+        formats = []
+        streaming = player['streamingData']
+        for fmt in streaming.get('formats', []) + streaming.get('adaptiveFormats', []):
+            mime, _, codecs = fmt['mimeType'].partition(';')
+            formats.append({
+                'format_id': str(fmt['itag']),
+                'url': fmt['url'],
+                'ext': mimetype2ext(mime),
+                'filesize': int_or_none(fmt.get('contentLength')),
+                'tbr': (fmt.get('bitrate') or 0) / 1000,
+                'width': fmt.get('width'),
+                'height': fmt.get('height'),
+                **parse_codecs(codecs.strip().removeprefix('codecs=').strip('"'))
+            })
+
+        return {
+            'id': video_id,
+            'title': details['title'],
+            'duration': int_or_none(details.get('lengthSeconds')),
+            'uploader': details.get('author'),
+            'channel': details.get('author'),
+            'view_count': int_or_none(details.get('viewCount')),
+            'thumbnails': [{'url': self._standin(f'/vi/{video_id}/default.jpg')}],
+            'formats': formats
+        }
+
+
+class StandInPlaylistIE(_StandInBaseIE):
+    IE_NAME = 'standin:playlist'
+    _VALID_URL = r'https?://(?:www\.)?(?:youtube\.com|youtu\.be)/.*[?&]list=(?P<id>[^&]+)'
+
+    def _page(self, playlist_id, page):
+        webpage = self._download_webpage(
+            self._standin(f'/playlist?list={playlist_id}&page={page}'), playlist_id, note=f'Downloading page {page}'
+        )
+        return self._search_json(r'var\s+ytInitialData\s*=', webpage, 'initial data', playlist_id)
+
+    def _entries(self, playlist_id, data):
+        # Pages are only fetched while the entries are iterated, like the continuations of YouTube's tab extractor
+        while True:
+            for v in data['videos']:
+                yield self.url_result(
+                    f"https://www.youtube.com/watch?v={v['videoId']}", StandInIE, v['videoId'], v['title']
+                )
+            if data.get('continuation') is None:
+                return
+            data = self._page(playlist_id, data['continuation'])
+
+    def _real_extract(self, url):
+        playlist_id = self._match_id(url)
+        data = self._page(playlist_id, 0)
+        return self.playlist_result(
+            self._entries(playlist_id, data), playlist_id, data['title'], playlist_count=data.get('count')
+        )
@@ -1,22 +1,34 @@
 import os
+import shutil
+from functools import lru_cache
 from platform import system as platform_name
 
 from utility.cli import CLI
-from utility.spinner import Spinner
+from utility.spinner import Progress, Spinner
 
 CONFIG = None
 DOWNLOAD = None
 SPINNER = None
+PROGRESS = None
+METADATA_CACHE = None
+DOWNLOAD_JOURNAL = None
+JOBS = None
+LIBRARY = None
 cli = CLI()
 DOWNLOAD_PATH_KEY = "download_path"  # The name of the key for download path
+METRICS_PATH_KEY = "metrics_path"  # Optional, where the stage timings go (.prom for a Prometheus text file)
+DUPLICATES_KEY = "duplicates"  # Optional, what is done with a video the library already has: skip, hardlink or reflink
 CONFIG_FILE_NAME = "yt_downloader_config.json"
+METADATA_CACHE_FILE_NAME = "metadata_cache.sqlite3"
+DOWNLOAD_JOURNAL_FILE_NAME = "download_journal.jsonl"
+JOBS_FILE_NAME = "jobs.sqlite3"
+LIBRARY_FILE_NAME = "library.sqlite3"
 is_windows = True if platform_name().lower() in ['windows', 'nt'] else False
-is_su = (os.system('command -v su > /dev/null 2>&1') == 0) if not is_windows else False
 su_shell_script_path = os.path.join(os.path.split(__file__)[0], "files", "copy_file_su.sh")
 shell_script_path = os.path.join(os.path.split(__file__)[0], "files", "copy_file.sh")
 
 def set_config():
-    global CONFIG, DOWNLOAD, SPINNER
+    global CONFIG, DOWNLOAD, SPINNER, PROGRESS, METADATA_CACHE, DOWNLOAD_JOURNAL, JOBS, LIBRARY
 
     if is_windows:
         CONFIG = os.path.join(
@@ -26,12 +38,25 @@ def set_config():
     else:
         CONFIG = os.path.join(os.path.split(__file__)[0], "files", CONFIG_FILE_NAME)
 
+    # The metadata cache, the download journal, the job queue and the library index live next to the config file
+    METADATA_CACHE = os.path.join(os.path.split(CONFIG)[0], METADATA_CACHE_FILE_NAME)
+    DOWNLOAD_JOURNAL = os.path.join(os.path.split(CONFIG)[0], DOWNLOAD_JOURNAL_FILE_NAME)
+    JOBS = os.path.join(os.path.split(CONFIG)[0], JOBS_FILE_NAME)
+    LIBRARY = os.path.join(os.path.split(CONFIG)[0], LIBRARY_FILE_NAME)
+
     if is_windows:
         DOWNLOAD = os.path.join(os.getenv('USERPROFILE'), "Downloads")
     else:
         DOWNLOAD = os.path.join(os.path.split(__file__)[0], "downloads")
 
     SPINNER = Spinner(msg="", speed=0.1)
+    PROGRESS = Progress(speed=0.2)
+
+
+@lru_cache(maxsize=None)
+def has_su() -> bool:
+    """Whether 'su' is available, looked up on first use (without spawning a shell)"""
+    return (shutil.which('su') is not None) if not is_windows else False
 
 
 def cls():
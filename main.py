@@ -4,11 +4,22 @@ import subprocess as sp
 import os
 import random
 
-from config import CONFIG, DOWNLOAD, DOWNLOAD_PATH_KEY, SPINNER, cls, loading, cli, is_windows, shell_script_path, is_su, su_shell_script_path
-from utility import search, download
+from config import CONFIG, DOWNLOAD, DOWNLOAD_PATH_KEY, DUPLICATES_KEY, METRICS_PATH_KEY, SPINNER, PROGRESS, METADATA_CACHE, DOWNLOAD_JOURNAL, LIBRARY, cls, loading, cli, is_windows, shell_script_path, has_su, su_shell_script_path
+from utility import search, download, info, library, metrics, probe, relocate
+from utility.cache import MetadataCache
+from utility.journal import Journal
 
 WORK_AROUND = False
 WORK_AROUND_FOLDER_NAME = None
+WORK_AROUND_PARENT = os.path.split(__file__)[0]  # Where the temp folder is made, chosen by the probe
+
+# Extracted info dicts are reused between sessions
+info.CACHE = MetadataCache(METADATA_CACHE)
+# Finished downloads are skipped, interrupted ones resumed
+download.JOURNAL = Journal(DOWNLOAD_JOURNAL)
+# Videos already downloaded into another folder/playlist are linked, not downloaded again
+download.LIBRARY = library.Library(LIBRARY)
+download.LIBRARY.journal = download.JOURNAL
 
 
 def loadConfig() -> dict:
@@ -48,17 +59,48 @@ def writeConfig(path: str) -> dict:
         return {DOWNLOAD_PATH_KEY: DOWNLOAD}
 
 
+def probePath(d_path: str) -> probe.Capabilities:
+    """Probes (once per path) whether downloads can go straight into d_path"""
+    return probe.probe(d_path, (os.path.split(os.path.abspath(d_path))[0], os.path.split(__file__)[0]))
+
+
+def setLibrary(root: str, mode: str = None) -> None:
+    """Points the library at the download root, mode (see library.MODES) defaults to the configured one"""
+    mode = mode or loadConfig().get(DUPLICATES_KEY) or library.HARDLINK
+    if mode not in library.MODES:
+        cli.error(f"Unknown '{DUPLICATES_KEY}' {mode!r}, using {library.HARDLINK}")
+        mode = library.HARDLINK
+    download.LIBRARY.root = root
+    download.LIBRARY.mode = mode
+
+
+def workAroundPath() -> str:
+    return os.path.join(WORK_AROUND_PARENT, WORK_AROUND_FOLDER_NAME)
+
+
 def setPath() -> None:
     """Sets 'CWD' to the DOWNLOAD directory if WORK_AROUND is False"""
+    global WORK_AROUND, WORK_AROUND_PARENT
 
     if WORK_AROUND:
-        new_path = os.path.join(os.path.split(__file__)[0], WORK_AROUND_FOLDER_NAME)
+        new_path = workAroundPath()
         os.makedirs(new_path, exist_ok=True)
         os.chdir(new_path)
+        # The files are moved into the download path afterwards, it needs the space too
+        relocate.route(new_path, loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD))
         return
 
     try:
         d_path = loadConfig().get(DOWNLOAD_PATH_KEY)
+
+        # Picks the strategy before any byte is downloaded instead of failing mid-download
+        caps = probePath(d_path)
+        if caps.strategy != probe.DIRECT:
+            WORK_AROUND = True
+            WORK_AROUND_PARENT = caps.temp_parent or WORK_AROUND_PARENT
+            cli.root(f"Unable to write into {d_path} directly, using {caps.strategy} workaround.")
+            return setPath()
+
         os.makedirs(d_path, exist_ok=True)
         os.chdir(d_path)
     except Exception as cwd_error:
@@ -95,11 +137,12 @@ def work(file, destination_dir, temp_dir):
     except Exception as e:
         cli.error(f"Error: {e}")
 
+@metrics.timed(metrics.WORKAROUND, item=lambda: WORK_AROUND_FOLDER_NAME)
 def workaroundResolver() -> None:
     if not WORK_AROUND:
         return
 
-    temp_path = os.path.join(os.path.split(__file__)[0], WORK_AROUND_FOLDER_NAME)
+    temp_path = workAroundPath()
 
     if not os.path.exists(temp_path):
         return
@@ -114,12 +157,28 @@ def workaroundResolver() -> None:
 
         os.makedirs(dest_path, exist_ok=True)
 
-        for file in os.listdir(temp_path):
+        # Renames/copies in-process first, the scripts are only used for what that couldn't move
+        moved = {}
+        for root, _, files in os.walk(temp_path):
+            # Playlist folders are recreated inside the destination
+            target = os.path.normpath(os.path.join(dest_path, os.path.relpath(root, temp_path)))
+            for file_path, result in relocate.relocate_all([os.path.join(root, f) for f in files], target).items():
+                moved[file_path] = (result, target)
+        failed = []
 
-            if is_su:
+        for file_path, (result, target) in moved.items():
+            file = os.path.relpath(file_path, temp_path)
+
+            if not isinstance(result, Exception):
+                cli.success(f"Moved {file}")
+                continue
+
+            cli.error(f"Unable to move {file}: {repr(result)}")
+
+            if has_su():
                 try:
                     cli.root("Running Super User Script...")
-                    sp.run([su_shell_script_path, file, dest_path], check=True)
+                    sp.run([su_shell_script_path, file, target], check=True)
                     cli.success("Success!")
                     continue
                 except Exception as e:
@@ -128,24 +187,23 @@ def workaroundResolver() -> None:
             if not is_windows:
                 try:
                     cli.root("Running Script...")
-                    sp.run([shell_script_path, file, dest_path], check=True)
+                    sp.run([shell_script_path, file, target], check=True)
                     cli.success("Success!")
                 except Exception as e:
                     cli.error(f"Error: {repr(e)}")
                     try:
                         cli.root("Using Diffrent Method...")
-                        work(file, dest_path, temp_path)
+                        work(file, target, temp_path)
                         cli.success("Success!")
                     except Exception as e:
+                        failed.append(file)
                         cli.error(f"Unable to do Anything :(\nError: {repr(e)}")
             else:
-                try:
-                    cli.root(f"Running Simple Command...")
-                    sp.run(['copy', os.path.join(temp_path, file), dest_path], check=True)
-                except Exception as e:
-                    cli.error(f"An Error Occured: {repr(e)}")
+                failed.append(file)
 
-        if os.path.exists(temp_path):
+        if failed:
+            print(f"{cli.info_symbol}{cli.yellow} {len(failed)} file(s) are still saved in: {temp_path}")
+        elif os.path.exists(temp_path):
             shutil.rmtree(temp_path)
     except PermissionError:
 
@@ -171,7 +229,12 @@ def download_helper(q: search.Query, video: bool) -> None:
     cli.info(f"Downloading...\n{q.title} [{q.duration}]")
     try:
 
-        download.Download(q.url, q.title, video)
+        PROGRESS.start()
+        try:
+            download.Download(q.url, q.title, video, progress_hook=PROGRESS.hook)
+        finally:
+            # Whatever happened, the renderer must not keep drawing over the prompts
+            PROGRESS.stop()
         print(f"{cli.success_symbol}{cli.cyan} {q.title} downloaded!")
 
     except PermissionError:
@@ -190,15 +253,22 @@ def download_helper(q: search.Query, video: bool) -> None:
 @loading(SPINNER, f"{cli.magenta}Extracting Playlist...{cli.reset}")
 def extract_playlist(url: str, video: bool) -> download.DownloadPlaylist:
     cls()
-    return download.DownloadPlaylist(url, video)
+    return download.DownloadPlaylist(url, video, progress_hook=PROGRESS.hook)
 
 
 def download_playlist(o: download.DownloadPlaylist) -> None:
     cli.info(f"Downloading...\n{o.title}")
     try:
 
-        o.download()
-        print(f"{cli.success_symbol}{cli.cyan} {o.title} downloaded!")
+        PROGRESS.start()
+        try:
+            failed = [e for e in o.download() if not e.ok]
+        finally:
+            PROGRESS.stop()
+        if failed:
+            cli.error(f"{len(failed)} of {len(o.results)} entries of {o.title} failed!")
+        else:
+            print(f"{cli.success_symbol}{cli.cyan} {o.title} downloaded!")
 
     except PermissionError:
 
@@ -210,7 +280,11 @@ def download_playlist(o: download.DownloadPlaylist) -> None:
         print(f"{cli.root_symbol}{cli.magenta} Using WorkAround."
               f"\nDownloading in :{os.getcwd()}")
 
-        o.download()
+        PROGRESS.start()
+        try:
+            o.download()
+        finally:
+            PROGRESS.stop()
 
 
 def path_validate() -> None:
@@ -271,15 +345,19 @@ def main() -> None:
     is_playlist = search.is_playlist(query)
     is_url = search.is_url(query)
 
-    if is_url:
+    if is_url or is_playlist:
         if is_playlist:
             # downloads the playlist based on given url
             downloader(playlist=True, url=query, video=video)
-            return
         else:
             # download the video from the url
             downloader(q=get_result(query), video=video)
-            return
+
+        # Workaround completer
+        if WORK_AROUND:
+            workaroundResolver()
+
+        return
     else:
         results = get_results(query)
         show_items(results)
@@ -302,6 +380,11 @@ def main() -> None:
 
 if __name__ == '__main__':
     init_dir = os.getcwd()
+    # The configured path is probed once at startup, the result is cached per path
+    probePath(loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD))
+    setLibrary(os.path.abspath(os.path.expanduser(loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD))))
+    if loadConfig().get(METRICS_PATH_KEY):
+        metrics.SINK = metrics.Recorder(os.path.abspath(os.path.expanduser(loadConfig()[METRICS_PATH_KEY])))
     while True:
         WORK_AROUND_FOLDER_NAME = f".temp_{random.randint(0, 100000000000)}"
         try:
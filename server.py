@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from batch import Item, run_item, settle, work_directory
+from config import DOWNLOAD, DOWNLOAD_PATH_KEY, JOBS, cli
+from main import loadConfig, setLibrary
+from utility import download, relocate
+from utility.jobs import CANCELLED, Job, JobQueue
+
+DEFAULT_PORT = 8787
+
+
+class Daemon:
+
+    """
+    Runs the queued jobs on a pool of worker threads, one warm process for every client
+    :param queue: The persistent job queue
+    :param workers: Jobs running at the same time
+    :param playlist_workers: Entries of a playlist downloaded at the same time
+    :param roots: The directories jobs may download into, the configured download path if None
+    """
+
+    def __init__(
+            self, queue: JobQueue, workers: int = 4, playlist_workers: int = download.PLAYLIST_WORKERS,
+            roots: list[str] = None
+    ) -> None:
+        self.queue = queue
+        self.roots = [
+            os.path.realpath(os.path.expanduser(root))
+            for root in roots or [loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD)]
+        ]
+        self.workers = max(1, workers)
+        self.playlist_workers = max(1, playlist_workers)
+        self.progress = {}  # job id -> {filename: progress}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        recovered = self.queue.recover()
+        if recovered:
+            cli.info(f"{recovered} interrupted job(s) queued again")
+
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"Job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        # Running jobs are queued again on the next start
+        self._stop.set()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self.queue.next(timeout=1)
+            if job is not None:
+                self._run(job)
+
+    def _hook(self, job: Job):
+        def hook(d: dict) -> None:
+            progress = {
+                'status': d.get('status'),
+                'downloaded_bytes': d.get('downloaded_bytes'),
+                'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+                'speed': d.get('speed'),
+                'eta': d.get('eta')
+            }
+            with self._lock:
+                self.progress.setdefault(job.id, {})[d.get('filename') or d.get('tmpfilename')] = progress
+
+        return hook
+
+    def destination(self, path: str = None) -> Optional[str]:
+        """
+        Where a job downloads to, None if path isn't inside one of the roots
+        :param path: The destination a client asked for, relative ones are inside the first root (itself if None)
+        """
+        if not path:
+            return self.roots[0]
+
+        # Resolved first, neither '..' nor a symlink leads out of a root
+        path = os.path.realpath(os.path.join(self.roots[0], os.path.expanduser(path)))
+        for root in self.roots:
+            if os.path.commonpath([root, path]) == root:
+                return path
+        return None
+
+    def _run(self, job: Job) -> None:
+        cli.info(f"Job {job.id}: {job.query}")
+        # Checked again, the job may have been queued before the roots changed
+        destination = self.destination(job.destination)
+
+        item = Item(job.query)
+        work_dir = None
+        try:
+            if destination is None:
+                item.error = f"{job.destination} is outside of the allowed directories"
+            else:
+                work_dir = work_directory(destination)
+                if work_dir is None:
+                    item.error = f"Unable to write into {destination}"
+                else:
+                    run_item(item, job.video, self.playlist_workers, directory=work_dir, progress_hook=self._hook(job))
+                    if settle(work_dir, destination):
+                        item.error = item.error or f"Some files are still saved in {work_dir}"
+        except Exception as e:
+            item.error = repr(e)
+        finally:
+            if work_dir is not None and work_dir != destination:
+                # The next job gets a temp folder of its own
+                relocate.unroute(work_dir)
+
+        self.queue.finish(job, item.error, item.title)
+        with self._lock:
+            # Only running jobs have progress, the queue has the outcome
+            self.progress.pop(job.id, None)
+        if item.ok:
+            cli.success(f"Job {job.id}: {item.title}")
+        else:
+            cli.error(f"Job {job.id}: {item.error}")
+
+    def status(self, job: Job) -> dict:
+        status = job.to_dict()
+        with self._lock:
+            status['progress'] = dict(self.progress.get(job.id) or {})
+        return status
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    """
+    The JSON API
+        POST   /jobs                 {"query": url or search, "video": false, "destination": null}
+        GET    /jobs[?state=queued]
+        GET    /jobs/<id>
+        GET    /jobs/<id>/progress
+        DELETE /jobs/<id>            cancels a queued job
+        GET    /health
+    """
+
+    daemon: Daemon = None
+
+    def address_string(self):
+        # Unix sockets have no client address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _parts(self) -> tuple[list[str], dict]:
+        url = urlsplit(self.path)
+        return [p for p in url.path.split('/') if p], {k: v[0] for k, v in parse_qs(url.query).items()}
+
+    def _job(self, job_id: str):
+        job = self.daemon.queue.get(job_id)
+        if job is None:
+            self._send(404, {'error': f"No job {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts, query = self._parts()
+
+        if parts == ['health']:
+            return self._send(200, {'ok': True, 'workers': self.daemon.workers})
+
+        if parts == ['jobs']:
+            try:
+                limit = int(query.get('limit', 100))
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return self._send(400, {'error': "'limit' must be a positive number"})
+            jobs = self.daemon.queue.list(query.get('state'), limit)
+            return self._send(200, {'jobs': [job.to_dict() for job in jobs]})
+
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self._job(parts[1])
+            if job is None:
+                return
+            status = self.daemon.status(job)
+            return self._send(200, status['progress'] if parts[2:] == ['progress'] else status)
+
+        self._send(404, {'error': "Not found"})
+
+    def do_POST(self):
+        parts, _ = self._parts()
+        if parts != ['jobs']:
+            return self._send(404, {'error': "Not found"})
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        except ValueError:
+            return self._send(400, {'error': "Invalid JSON"})
+
+        query = str(body.get('query') or '').strip()
+        if not query:
+            return self._send(400, {'error': "'query' (an url or a search) is required"})
+
+        destination = None
+        if body.get('destination'):
+            destination = self.daemon.destination(str(body['destination']))
+            if destination is None:
+                return self._send(403, {
+                    'error': "'destination' must be inside one of the allowed directories", 'roots': self.daemon.roots
+                })
+
+        job = self.daemon.queue.submit(query, bool(body.get('video')), destination)
+        self._send(201, job.to_dict())
+
+    def do_DELETE(self):
+        parts, _ = self._parts()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self._send(404, {'error': "Not found"})
+
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if not self.daemon.queue.cancel(job.id):
+            return self._send(409, {'error': f"Job {job.id} is {job.state}, only queued jobs can be cancelled"})
+        self._send(200, dict(job.to_dict(), state=CANCELLED))
+
+
+class ThreadingUnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download daemon with a JSON API and a persistent job queue")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--socket', default=None, help="Listens on this Unix socket instead of TCP")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Jobs running at the same time")
+    parser.add_argument(
+        '-p', '--playlist-workers', type=int, default=download.PLAYLIST_WORKERS,
+        help="Entries of a playlist downloaded at the same time"
+    )
+    parser.add_argument('--jobs-db', default=JOBS, help="SQLite file of the job queue")
+    parser.add_argument(
+        '--root', action='append', default=None,
+        help="Directory the 'destination' of a job must be inside of (repeatable), the configured download path if none"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] = None) -> int:
+    args = parse_args(argv)
+
+    # Jobs with their own destination are still indexed, only the configured root is scanned
+    setLibrary(os.path.abspath(os.path.expanduser(loadConfig().get(DOWNLOAD_PATH_KEY, DOWNLOAD))))
+    daemon = Daemon(JobQueue(args.jobs_db), args.workers, args.playlist_workers, args.root)
+    handler = type('DaemonHandler', (Handler,), {'daemon': daemon})
+
+    if args.socket:
+        if not hasattr(socket, 'AF_UNIX'):
+            cli.error("Unix sockets are not supported here, use --port")
+            return 2
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixServer(args.socket, handler)
+        where = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        server.daemon_threads = True
+        where = f"http://{args.host}:{server.server_address[1]}"
+
+    daemon.start()
+    cli.success(f"Listening on {where} with {daemon.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported the way the scripts at the root import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import pytest
+
+from utility import info
+
+
+@pytest.fixture(autouse=True)
+def infos(monkeypatch):
+    monkeypatch.setattr(info, '_INFOS', info.OrderedDict())
+    monkeypatch.setattr(info, 'MAX_INFOS', 3)
+
+
+def test_remember_is_bounded():
+    for n in range(5):
+        info.remember(f"https://example.com/{n}", {'id': str(n)})
+    assert [url for url, _ in info._INFOS] == [f"https://example.com/{n}" for n in (2, 3, 4)]
+
+
+def test_the_least_recently_used_goes_first():
+    for n in range(3):
+        info.remember(f"https://example.com/{n}", {'id': str(n)})
+    assert info.get_info("https://example.com/0") == {'id': '0'}  # Known, nothing is extracted
+
+    info.remember("https://example.com/3", {'id': '3'})
+    assert [url for url, _ in info._INFOS] == [f"https://example.com/{n}" for n in (2, 0, 3)]
+
+
+def test_forget():
+    info.remember("https://example.com/a", {'id': 'a', 'webpage_url': "https://example.com/b"})
+    info.forget("https://example.com/a")
+    assert not info._INFOS
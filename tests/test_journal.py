@@ -0,0 +1,39 @@
+from utility import relocate
+from utility.journal import DONE, STARTED, Journal, JournalArchive
+
+
+def test_journal_round_trip(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    song = tmp_path / 'song.m4a'
+    journal = Journal(str(path))
+    key = Journal.key('abc', False, str(tmp_path))
+    journal.record(key, STARTED, id='abc', format='140', path=None)
+    assert not journal.is_done(key)
+
+    journal.record(key, DONE, path=str(song), bytes=5)
+    assert not journal.is_done(key)  # Its file is gone
+    song.write_bytes(b'audio')
+
+    loaded = Journal(str(path))
+    assert loaded.is_done(key)
+    record = loaded.get(key)
+    assert record['format'] == '140'  # Kept from the STARTED record
+    assert record['path'] == str(song)
+    assert [r['key'] for r in loaded.finished()] == [key]
+    assert 'youtube abc' in JournalArchive(loaded, False, str(tmp_path))
+    assert 'youtube abc' not in JournalArchive(loaded, True, str(tmp_path))
+
+
+def test_journal_records_where_files_end_up(tmp_path):
+    work, dest = tmp_path / 'work', tmp_path / 'dest'
+    relocate.route(str(work), str(dest))
+    try:
+        journal = Journal(str(tmp_path / 'journal.jsonl'))
+        key = Journal.key('abc', False, str(work))
+        assert key == Journal.key('abc', False, str(dest))
+
+        journal.record(key, DONE, id='abc', path=str(work / 'song.m4a'), directory=str(work))
+        assert journal.get(key)['path'] == str(dest / 'song.m4a')
+        assert journal.get(key)['directory'] == str(dest)
+    finally:
+        relocate.unroute(str(work))
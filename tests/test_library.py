@@ -0,0 +1,25 @@
+import os
+
+from utility import library, relocate
+
+
+def test_add_indexes_where_the_file_settles(tmp_path):
+    work, dest = tmp_path / 'work', tmp_path / 'dest'
+    (work / 'list').mkdir(parents=True)
+    (dest / 'list').mkdir(parents=True)
+    song = work / 'list' / 'song.m4a'
+    song.write_bytes(b'audio')
+
+    lib = library.Library(str(tmp_path / 'library.sqlite3'), root=str(dest))
+    relocate.route(str(work), str(dest))
+    try:
+        lib.add('abc', False, relocate.settled(str(song)), '140')
+        with lib._connection() as conn:
+            assert conn.execute("SELECT path FROM files").fetchall() == [(str(dest / 'list' / 'song.m4a'),)]
+        # Not moved yet, the file is found in the work directory
+        assert lib.find('abc', False) == str(song)
+
+        os.replace(song, dest / 'list' / 'song.m4a')
+    finally:
+        relocate.unroute(str(work))
+    assert lib.find('abc', False) == str(dest / 'list' / 'song.m4a')
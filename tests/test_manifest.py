@@ -0,0 +1,75 @@
+import pytest
+
+from utility import relocate
+from utility.manifest import Manifest
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """A work-around temp folder whose files are moved into dest"""
+    work, dest = tmp_path / 'work', tmp_path / 'dest'
+    work.mkdir()
+    dest.mkdir()
+    relocate.route(str(work), str(dest))
+    yield work, dest
+    relocate.unroute(str(work))
+
+
+def test_manifest_round_trip(tmp_path):
+    song = tmp_path / '1 - Song.m4a'
+    song.write_bytes(b'audio')
+    manifest = Manifest(str(tmp_path))
+    manifest.playlist = {'id': 'PL1', 'title': 'Playlist', 'url': 'https://www.youtube.com/playlist?list=PL1'}
+    manifest.add('abc', False, str(song), 'Song', 1, '140')
+    manifest.save()
+
+    loaded = Manifest(str(tmp_path))
+    assert loaded.playlist == manifest.playlist
+    assert loaded.entries == manifest.entries
+    assert loaded.get('abc', False)['format'] == '140'
+    assert loaded.file('abc', False) == str(song)
+    assert loaded.file('abc', True) is None  # The video of the entry is another one
+
+
+def test_manifest_update_keeps_file_unless_renamed(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    manifest.add('abc', False, str(tmp_path / '1 - Song.m4a'), 'Song', 1)
+
+    manifest.update('abc', False, 'Song', 4)
+    assert manifest.get('abc', False)['file'] == '1 - Song.m4a'
+    assert manifest.get('abc', False)['index'] == 4
+
+    manifest.update('abc', False, 'New Song', 4, str(tmp_path / '4 - New Song.m4a'))
+    assert manifest.get('abc', False)['file'] == '4 - New Song.m4a'
+    assert manifest.get('abc', False)['title'] == 'New Song'
+
+
+def test_manifest_prune(tmp_path):
+    kept, removed = tmp_path / 'kept.m4a', tmp_path / 'removed.m4a'
+    kept.write_bytes(b'a')
+    removed.write_bytes(b'b')
+    manifest = Manifest(str(tmp_path))
+    manifest.add('kept', False, str(kept))
+    manifest.add('removed', False, str(removed))
+    manifest.add('removed', True, str(removed.with_suffix('.mp4')))
+
+    assert manifest.prune({'kept'}, False) == [str(removed)]
+    assert kept.exists() and not removed.exists()
+    assert manifest.get('removed', True) is not None  # Only the entries of the mode are pruned
+
+
+def test_manifest_of_a_work_directory(routed):
+    work, dest = routed
+    (dest / 'old.m4a').write_bytes(b'a')
+    settled = Manifest(str(dest))
+    settled.add('old', False, str(dest / 'old.m4a'), 'Old', 1)
+    settled.save()
+
+    manifest = Manifest(str(work))
+    # Read from where the files end up, the files there count as the folder's
+    assert manifest.file('old', False) == str(dest / 'old.m4a')
+
+    manifest.add('new', False, str(work / 'new.m4a'), 'New', 2)
+    manifest.save()
+    assert (work / '.manifest.json').exists()  # Moved into dest along with the files
+    assert manifest.get('new', False)['file'] == 'new.m4a'
@@ -0,0 +1,74 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+
+from utility import merge, segmented
+from utility.scheduler import BULK, SCHEDULER
+
+MiB = 1024 ** 2
+HOST = 'rr1---sn-example.googlevideo.com'
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Fakes the transfers behind segmented.fetch, records when each stream was downloading"""
+    spans = {}
+    lock = threading.Lock()
+
+    def download(path, stream):
+        start = time.monotonic()
+        time.sleep(0.3)
+        with open(path, 'wb') as file:
+            file.write(b'x')
+        with lock:
+            spans[stream['format_id']] = (start, time.monotonic())
+        return True, {}
+
+    class FakeYDL:
+        params = {}
+
+        def dl(self, path, stream):
+            return download(path, stream)
+
+    class FakeSegmentedFD:
+        connections = 1
+
+        def __init__(self, ydl, params):
+            pass
+
+        def add_progress_hook(self, hook):
+            pass
+
+        def download(self, path, stream):
+            return download(path, stream)
+
+    @contextmanager
+    def borrow(options):
+        yield FakeYDL()
+
+    monkeypatch.setattr(segmented, 'borrow', borrow)
+    monkeypatch.setattr(segmented, 'SegmentedFD', FakeSegmentedFD)
+    monkeypatch.setattr(merge, 'remux', lambda video, audio, output: open(output, 'wb').close())
+    # The defaults: as many connections per host as a segmented fetch asks for
+    monkeypatch.setattr(SCHEDULER, 'per_host', 4)
+    monkeypatch.setattr(SCHEDULER, 'connections', 4)
+    return spans
+
+
+def fmt(format_id: str, size: int) -> dict:
+    return {'format_id': format_id, 'ext': 'mp4', 'protocol': 'https', 'filesize': size,
+            'url': f"https://{HOST}/videoplayback?itag={format_id}"}
+
+
+@pytest.mark.parametrize('audio_size', [1 * MiB, 3 * segmented.MIN_SIZE])
+def test_audio_and_video_streams_overlap(fetched, tmp_path, audio_size):
+    formats = [fmt('140', audio_size), fmt('137', 10 * segmented.MIN_SIZE)]
+    path = str(tmp_path / 'video.mp4')
+    assert merge.fetch_and_merge('https://www.youtube.com/watch?v=x', {'id': 'x'}, formats, path, {}, BULK) == path
+
+    (audio_start, audio_end), (video_start, video_end) = fetched['140'], fetched['137']
+    assert audio_start < video_end and video_start < audio_end
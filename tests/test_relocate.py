@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from utility import relocate
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / 'src' / 'song.m4a'
+    path.parent.mkdir()
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    return path
+
+
+@pytest.fixture
+def no_rename(monkeypatch):
+    """Another filesystem: renaming into another directory fails, the file has to be copied"""
+    rename = os.replace
+
+    def replace(src, dst):
+        if os.path.dirname(src) != os.path.dirname(dst):
+            raise OSError(18, "Invalid cross-device link")
+        rename(src, dst)
+    monkeypatch.setattr(relocate.os, 'replace', replace)
+
+
+def test_relocate_renames(src, tmp_path):
+    data = src.read_bytes()
+    dst = relocate.relocate(str(src), str(tmp_path))
+    assert dst == str(tmp_path / 'song.m4a')
+    assert not src.exists()
+    assert open(dst, 'rb').read() == data
+
+
+def test_relocate_copies_and_verifies(src, tmp_path, no_rename):
+    data = src.read_bytes()
+    dst = relocate.relocate(str(src), str(tmp_path))
+    assert open(dst, 'rb').read() == data
+    assert not src.exists()
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:-1],  # Cut short
+    lambda data: bytes([data[0] ^ 0xFF]) + data[1:],  # Same size, other content
+])
+def test_relocate_keeps_the_source_of_a_bad_copy(src, tmp_path, no_rename, monkeypatch, damage):
+    def copy(s, d):
+        with open(s, 'rb') as fsrc, open(d, 'wb') as fdst:
+            fdst.write(damage(fsrc.read()))
+    monkeypatch.setattr(relocate, 'copy', copy)
+
+    with pytest.raises(OSError, match='mismatch'):
+        relocate.relocate(str(src), str(tmp_path))
+    assert src.exists()
+    assert not (tmp_path / 'song.m4a').exists()
+    assert [p.name for p in tmp_path.iterdir()] == ['src']
+
+
+def test_relocate_keeps_the_existing_file_on_a_bad_copy(src, tmp_path, no_rename, monkeypatch):
+    existing = tmp_path / 'song.m4a'
+    existing.write_bytes(b'already there')
+
+    def copy(s, d):
+        with open(d, 'wb') as fdst:
+            fdst.write(b'short')
+    monkeypatch.setattr(relocate, 'copy', copy)
+
+    with pytest.raises(OSError, match='mismatch'):
+        relocate.relocate(str(src), str(tmp_path))
+    assert src.exists()
+    assert existing.read_bytes() == b'already there'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['song.m4a', 'src']
+
+
+def test_relocate_replaces_the_existing_file_with_a_good_copy(src, tmp_path, no_rename):
+    (tmp_path / 'song.m4a').write_bytes(b'old version')
+    data = src.read_bytes()
+    dst = relocate.relocate(str(src), str(tmp_path))
+    assert open(dst, 'rb').read() == data
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['song.m4a', 'src']
+
+
+def test_copy(src, tmp_path):
+    dst = tmp_path / 'copy.m4a'
+    relocate.copy(str(src), str(dst))
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_relocate_all_reports_every_file(src, tmp_path):
+    missing = str(tmp_path / 'src' / 'missing.m4a')
+    results = relocate.relocate_all([str(src), missing], str(tmp_path / 'dst'))
+    assert results[str(src)] == str(tmp_path / 'dst' / 'song.m4a')
+    assert isinstance(results[missing], OSError)
+
+
+def test_settled(tmp_path):
+    work, dest = tmp_path / 'work', tmp_path / 'dest'
+    relocate.route(str(work), str(dest))
+    try:
+        assert relocate.settled(str(work / 'a' / 'b.m4a')) == str(dest / 'a' / 'b.m4a')
+        assert relocate.settled(str(work)) == str(dest)
+        assert relocate.settled(str(tmp_path / 'work2')) == str(tmp_path / 'work2')
+    finally:
+        relocate.unroute(str(work))
+    assert relocate.settled(str(work / 'b.m4a')) == str(work / 'b.m4a')
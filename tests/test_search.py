@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from utility import search
+
+RESULTS = {
+    'first': ['aaaaaaaaaaa', 'bbbbbbbbbbb'],
+    'second': ['bbbbbbbbbbb', 'ccccccccccc'],
+}
+
+
+class FakeSearch:
+
+    def __init__(self, keyword, amount):
+        if keyword not in RESULTS:
+            raise ConnectionError(keyword)
+        self.ids = RESULTS[keyword][:amount]
+
+    def to_dict(self):
+        return [
+            {'id': v_id, 'title': v_id, 'url_suffix': f"/watch?v={v_id}", 'thumbnails': [f"{v_id}.jpg"]}
+            for v_id in self.ids
+        ]
+
+
+@pytest.fixture(autouse=True)
+def fake_search(monkeypatch):
+    youtube_search = pytest.importorskip('youtube_search')
+    monkeypatch.setattr(youtube_search, 'YoutubeSearch', FakeSearch)
+
+
+def collect(*args, **kwargs) -> list:
+    async def run():
+        return [q async for q in search.search_many(*args, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_search_many_yields_every_video_once():
+    queries = collect(['first', 'second', 'first'])
+    assert sorted(q.id for q in queries) == ['aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc']
+    assert all(q.keyword in RESULTS for q in queries)
+
+
+def test_search_many_keeps_duplicates_if_asked():
+    queries = collect(['first', 'second'], amount=1, unique=False)
+    assert {q.keyword: q.id for q in queries} == {'first': 'aaaaaaaaaaa', 'second': 'bbbbbbbbbbb'}
+
+
+def test_search_many_skips_urls_and_failures():
+    queries = collect(['https://www.youtube.com/watch?v=aaaaaaaaaaa', 'unknown', 'second'], amount=1)
+    assert [(q.keyword, q.id) for q in queries] == [('second', 'bbbbbbbbbbb')]
@@ -0,0 +1,88 @@
+import os
+from collections import namedtuple
+
+import pytest
+
+from utility import relocate, space
+from utility.space import MARGIN, Admission, NotEnoughSpace, Reservation, estimate
+
+MiB = 1024 ** 2
+Usage = namedtuple('Usage', 'total used free')
+
+
+@pytest.fixture
+def free(monkeypatch):
+    """Every filesystem has 100 MiB free (on top of the margin)"""
+    monkeypatch.setattr(space.shutil, 'disk_usage', lambda path: Usage(0, 0, MARGIN + 100 * MiB))
+
+
+def test_estimate():
+    assert estimate([{'filesize': 10 * MiB}, {'filesize_approx': 2 * MiB}]) == 12 * MiB
+    # 128 kbit/s for 80 seconds
+    assert estimate([{'abr': 128}], duration=80) == 128 * 1000 // 8 * 80
+    assert estimate([{'abr': 128}]) == 0
+    assert estimate([{}, {'filesize': 5}]) == 5
+
+
+def test_reservation_counts_what_is_written():
+    reservation = Reservation(10 * MiB, set())
+    reservation.hook({'status': 'downloading', 'downloaded_bytes': 4 * MiB, 'filename': 'a.m4a',
+                      'tmpfilename': 'a.m4a.part'})
+    assert reservation.outstanding == 6 * MiB
+
+    # yt_dlp reports the end without the .part name, it still is the same file
+    reservation.hook({'status': 'finished', 'downloaded_bytes': 7 * MiB, 'filename': 'a.m4a'})
+    assert reservation.outstanding == 3 * MiB
+
+
+@pytest.mark.skipif(not hasattr(os, 'posix_fallocate'), reason="Needs posix_fallocate")
+def test_reservation_counts_preallocated_blocks(tmp_path):
+    part = tmp_path / 'a.mp4.part'
+    with open(part, 'wb') as file:
+        try:
+            os.posix_fallocate(file.fileno(), 0, 4 * MiB)
+        except OSError:
+            pytest.skip("The filesystem doesn't preallocate")
+    if not getattr(os.stat(part), 'st_blocks', 0):
+        pytest.skip("No st_blocks here")
+
+    reservation = Reservation(4 * MiB, set())
+    reservation.hook({'status': 'downloading', 'downloaded_bytes': 0, 'filename': str(tmp_path / 'a.mp4'),
+                      'tmpfilename': str(part)})
+    assert reservation.outstanding == 0
+
+
+def test_admission_holds_what_running_downloads_need(free, tmp_path):
+    admission = Admission()
+    with admission.admit(60 * MiB, [str(tmp_path)]) as first:
+        assert admission.reservations == [first]
+        # 60 MiB of the 100 are still needed by the first one
+        with pytest.raises(NotEnoughSpace):
+            with admission.admit(60 * MiB, [str(tmp_path)], timeout=0):
+                pass
+
+        first.hook({'status': 'downloading', 'downloaded_bytes': 30 * MiB, 'filename': 'first'})
+        with admission.admit(60 * MiB, [str(tmp_path)], timeout=0) as second:
+            assert second.outstanding == 60 * MiB
+    assert admission.reservations == []
+
+
+def test_admission_rejects_what_never_fits(free, tmp_path):
+    admission = Admission()
+    with pytest.raises(NotEnoughSpace):
+        with admission.admit(101 * MiB, [str(tmp_path)]):
+            pass
+
+    # Unknown sizes aren't held back
+    with admission.admit(0, [str(tmp_path)]) as reservation:
+        assert reservation.outstanding == 0
+
+
+def test_admission_directories_of_a_work_directory(tmp_path):
+    work, dest = tmp_path / 'work', tmp_path / 'dest'
+    relocate.route(str(work), str(dest))
+    try:
+        assert Admission.directories(str(work / 'sub')) == [str(work / 'sub'), str(dest / 'sub')]
+    finally:
+        relocate.unroute(str(work))
+    assert Admission.directories(str(work)) == [str(work)]
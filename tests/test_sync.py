@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+# The stand-in YouTube of the benchmarks, its yt_dlp plugin takes over youtube urls while STANDIN_ENV is set
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from standin import STANDIN_ENV, StandIn, playlist_url
+from utility import download
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    with StandIn(videos=2, size=16 * 1024) as server:
+        monkeypatch.setenv(STANDIN_ENV, server.url)
+        yield server
+
+
+def sync(directory: str, **kwargs) -> dict:
+    playlist = download.DownloadPlaylist(playlist_url(), progress_hook=lambda d: None, directory=directory)
+    assert all(entry.ok for entry in playlist.sync(**kwargs))
+    return {name: os.stat(os.path.join(playlist.playlist_path, name)).st_mtime_ns
+            for name in os.listdir(playlist.playlist_path) if not name.startswith('.')}
+
+
+def test_refresh_downloads_entries_whose_formats_changed(standin, tmp_path, monkeypatch):
+    first = sync(str(tmp_path))
+    assert sorted(first) == [f"{n + 1} - Benchmark video {v_id}.m4a" for n, v_id in enumerate(standin.videos)]
+
+    # The audio only format of the second video is gone upstream, the muxed one is the best audio left
+    player_response = StandIn.player_response
+
+    def changed(self, v_id):
+        response = player_response(self, v_id)
+        if v_id == standin.videos[1]:
+            response['streamingData']['adaptiveFormats'] = []
+        return response
+
+    monkeypatch.setattr(StandIn, 'player_response', changed)
+    assert sync(str(tmp_path)) == first  # Only a refresh looks at the formats again
+
+    refreshed = sync(str(tmp_path), refresh=True)
+    unchanged, replaced = sorted(first)
+    assert refreshed[unchanged] == first[unchanged]
+    assert replaced not in refreshed
+    assert f"2 - Benchmark video {standin.videos[1]}.mp4" in refreshed
@@ -0,0 +1,33 @@
+from utility.urls import PLAYLIST, SEARCH, VIDEO, classify, classify_many
+
+
+def test_classify():
+    assert classify('https://youtu.be/dQw4w9WgXcQ?t=42').kind == VIDEO
+    assert classify('https://youtu.be/dQw4w9WgXcQ?t=42').start == 42
+    mixed = classify('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG')
+    assert mixed.kind == PLAYLIST and mixed.video_id == 'dQw4w9WgXcQ'
+    assert classify('never gonna give you up').kind == SEARCH
+    assert classify('never gonna give you up').url is None
+
+
+def test_classify_many_drops_duplicates():
+    lines = [
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://youtu.be/dQw4w9WgXcQ',
+        'https://m.youtube.com/watch?v=dQw4w9WgXcQ&t=10',
+        'Never  Gonna Give You Up',
+        'never gonna give you up',
+        '',
+        'https://www.youtube.com/playlist?list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG',
+        'https://www.youtube.com/playlist?list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG',
+    ]
+    result = classify_many(lines)
+    assert [u.key for u in result] == [
+        'video:dQw4w9WgXcQ',
+        'search:never gonna give you up',
+        'playlist:PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG',
+    ]
+    # The first occurrence is kept as it was given
+    assert result[0].text == lines[0]
+    assert result[1].text == 'Never  Gonna Give You Up'
+    assert result[0].url == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
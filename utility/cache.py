@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+DEFAULT_TTL = 3 * 60 * 60  # format urls of YouTube expire after ~6 hours
+DEFAULT_MAX_ENTRIES = 2000
+
+
+class MetadataCache:
+
+    """
+    On-disk cache of extracted info dicts, keyed by video/playlist id
+    :param path: The path of the SQLite database
+    :param ttl: Seconds after which an entry is extracted again
+    :param max_entries: How many entries are kept, the least recently used ones are evicted
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                with conn:
+                    if not self._ready:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS metadata ("
+                            "key TEXT PRIMARY KEY, info TEXT NOT NULL, formats TEXT NOT NULL, "
+                            "created REAL NOT NULL, used REAL NOT NULL)"
+                        )
+                        conn.execute("CREATE INDEX IF NOT EXISTS metadata_used ON metadata (used)")
+                        self._ready = True
+                    yield conn
+            finally:
+                conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached info dict (with its formats) or None if missing/expired"""
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT info, formats, created FROM metadata WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            if now - row[2] > self.ttl:
+                conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                return None
+
+            conn.execute("UPDATE metadata SET used = ? WHERE key = ?", (now, key))
+
+        info = json.loads(row[0])
+        formats = json.loads(row[1])
+        if formats is not None:
+            info['formats'] = formats
+        return info
+
+    def put(self, key: str, info: dict) -> None:
+        """Stores a sanitized (json serializable) info dict"""
+        info = dict(info)
+        formats = info.pop('formats', None)
+        now = time.time()
+
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, info, formats, created, used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(info, ensure_ascii=False), json.dumps(formats, ensure_ascii=False), now, now)
+            )
+            self._evict(conn, now)
+
+    def delete(self, key: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM metadata WHERE created < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM metadata WHERE key NOT IN (SELECT key FROM metadata ORDER BY used DESC LIMIT ?)",
+            (self.max_entries,)
+        )
@@ -0,0 +1,59 @@
+import os
+import re
+import threading
+
+# yt_dlp's leftovers next to a finished file: .part, .ytdl, .temp and the .f137-like format files
+PARTIAL = re.compile(r'\.(?:part|ytdl|temp)$|\.f[0-9]+(?:-[0-9]+)?\.[^.]+$|\.part-Frag[0-9]+$')
+
+
+class DirectoryIndex:
+
+    """
+    Finished files of a directory by name (without extension), read with one scandir
+    and only read again when the directory changed
+    :param directory: The directory to index
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.names = {}  # stem -> [full paths]
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            self.names, self._mtime = {}, None
+            return
+
+        if mtime == self._mtime:
+            return
+
+        names = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if PARTIAL.search(entry.name) or not entry.is_file():
+                    continue
+                names.setdefault(os.path.splitext(entry.name)[0], []).append(entry.path)
+        self.names, self._mtime = names, mtime
+
+    def find(self, stem: str):
+        """The finished file named stem (any extension), None if there is none"""
+        with self._lock:
+            self._refresh()
+            paths = self.names.get(stem)
+        return paths[0] if paths else None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index(directory: str) -> DirectoryIndex:
+    """The shared index of a directory"""
+    directory = os.path.abspath(directory)
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = DirectoryIndex(directory)
+        return _indexes[directory]
@@ -1,15 +1,34 @@
+import errno
 import os
 import time
-
-import yt_dlp
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Iterable, Iterator
 
 from utility import is_windows
-from .search import is_playlist
+from . import metrics
+from .dirindex import index as directory_index
+from .formats import FormatPolicy, format_spec, select
+from .info import forget, get_info, iter_playlist
+from .pool import borrow
+from .journal import DONE, FAILED, STARTED, Journal, JournalArchive
+from .library import Library
+from .manifest import Manifest
+from .merge import container, fetch_and_merge
+from .relocate import settled
+from .scheduler import BULK, HIGH, SCHEDULER
+from .search import is_playlist, video_id
+from .space import ADMISSION, NotEnoughSpace, estimate
+from .transcode import TRANSCODER, AudioTarget, available as ffmpeg_available
+
+PLAYLIST_WORKERS = 8  # Number of playlist entries downloaded at the same time
+JOURNAL: Journal = None  # Records every download so a restart skips finished ones, set by the caller
+LIBRARY: Library = None  # Downloaded files by video id, duplicates are linked, not downloaded, set by the caller
 
 
 def sanitize_filename(filename: str):
 
-    reserved_chars = [r'<', r'>', r':', r'"', r'/', r'\\', r'|', r'?', r'*']
+    # Elsewhere only the path separator can't be part of a name
+    reserved_chars = [r'<', r'>', r':', r'"', r'/', r'\\', r'|', r'?', r'*'] if is_windows else [r'/']
     for char in reserved_chars:
         filename = filename.replace(char, '_')
 
@@ -21,6 +40,60 @@ def sanitize_filename(filename: str):
     return filename
 
 
+def _filepath(result: dict):
+    """The final file of a processed info dict, None if nothing was downloaded"""
+    downloads = (result or {}).get('requested_downloads') or [{}]
+    return downloads[0].get('filepath') or (result or {}).get('filepath')
+
+
+def _transcodes(audio: AudioTarget, video: bool, formats: list[dict]) -> bool:
+    """Whether the audio goes through the transcoder instead of being saved as it is"""
+    if audio is None or video or not formats:
+        return False
+    if not ffmpeg_available():
+        print("ffmpeg not found, the audio is saved as it is!")
+        return False
+    return True
+
+
+def _merges(video: bool, formats: list[dict]) -> bool:
+    """Whether the audio and the video stream are fetched side by side and remuxed here, not one after the other"""
+    return video and len(formats) == 2 and ffmpeg_available()
+
+
+def _segments(formats: list[dict]) -> bool:
+    """Whether the single format is split over several connections instead of going over one"""
+    if len(formats) != 1:
+        return False
+    from .segmented import suitable  # Imports yt_dlp
+
+    return suitable(formats[0])
+
+
+def _fetch(info: dict, fmt: dict, path: str, options: dict, priority: int) -> str:
+    """Fetches the format into path over several connections, returns path"""
+    from .segmented import fetch  # Imports yt_dlp
+
+    return fetch(info, fmt, path, options, priority)
+
+
+def _library_ext(audio: AudioTarget, video: bool):
+    """
+    The extension a file of the library needs to be reused, None if any (merged video containers vary)
+    Known before the extraction, the library is asked before the formats are
+    """
+    if video or audio is None:
+        return None
+    return audio.ext
+
+
+def _transcode(url: str, info: dict, formats: list[dict], audio: AudioTarget, path: str, hooks: list,
+               priority: int) -> str:
+    """Streams the audio into ffmpeg (one of the shared transcoder's processes), returns the final path"""
+    with metrics.stage(url, metrics.TRANSCODE, target=repr(audio)):
+        return TRANSCODER.transcode(info, formats[0], audio, path, hooks, priority)
+
+
 class Download:
 
     """
@@ -28,104 +101,252 @@ class Download:
     :param url: The url of the video
     :param filename: The filename or simple pass the title of the video
     :param video: Whether to download video or audio
+    :param info: An already extracted info dict of the video (skips the extraction)
+    :param progress_hook: Called with yt_dlp's progress dicts, e.g. Progress.hook
+    :param policy: Limits and preferences for the format selection
+    :param priority: Scheduler priority of the transfer (scheduler.HIGH or scheduler.BULK)
+    :param audio: Transcodes the audio (streamed into ffmpeg) instead of saving the container as it is
+    :param directory: Where the file goes, the current directory by default
     """
 
-    def __init__(self, url: str, filename: str, video: bool = False) -> None:
+    def __init__(
+            self, url: str, filename: str, video: bool = False, info: dict = None, progress_hook=None,
+            policy: FormatPolicy = None, priority: int = HIGH, audio: AudioTarget = None, directory: str = None
+    ) -> None:
         self.url = url
         self.filename = sanitize_filename(filename) if is_windows else filename
+        self.error = None  # Set to the exception if the download failed
+        self.policy = policy
+        self.priority = priority
+        self.audio = audio
+        self.formats = []  # The formats picked by _choose_format_id
+        self.skipped = False  # Whether the journal says it was already downloaded
+        self.reused = None  # The file of the library this download was linked from
 
         playlist = is_playlist(self.url)
 
         if playlist:
             raise ValueError(f'Excepted a video url not a playlist url!')
 
-        self._set_options(video)
-        self.__download()
-
-    def _choose_format_id(self):
-        ydl_opts = {
-            'format': 'all',
-            'listformats': False,
-            'quiet': True
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(self.url, download=False)
-
-        fmts = info.get('formats', None)
-
-        if not fmts:
-            return None
-
-        audio = {}
-        audio_end_index = 0
-        for idx, a in enumerate(fmts, start=1):
-            if ('audio only' in a.get('format').lower()) and (a.get('abr', 0) not in [0, None]):
-                audio[len(audio) + 1] = a
-                audio_end_index = idx
-
-        video = {}
-        for idx, v in enumerate(fmts, start=1):
-            if idx <= audio_end_index:
-                continue
-            if (v.get('height', 0) == 0) or (v.get('vbr', 0) == 0):
-                continue
-            video[len(video) + 1] = v
-
-        high_video = max(video.values(), key=lambda a: (a.get('vbr', 0), a.get('height', 0)))
-        high_audio = max(audio.values(), key=lambda a: a.get('abr', 0))
+        self.directory = directory or os.getcwd()
+        self.video = video
+        self.info = info
+        self.id = video_id(self.url) or (info or {}).get('id')
+        # Both only need the id, a video they already have isn't even extracted
+        if self._is_done() or self._from_library():
+            return
 
-        return f"{high_audio['format_id']}+{high_video['format_id']}"
-    
-    def _set_options(self, video: bool):
+        # The only extraction of this url, everything below works on this info dict
+        self.info = info if info is not None else get_info(self.url)
+        if self.id is None:
+            self.id = self.info.get('id')
+            if self._is_done() or self._from_library():
+                return
 
-        fmt = self._choose_format_id()
+        self._set_options(video, progress_hook)
+        try:
+            # Held until the formats fit on the disk, refused before anything is written if they never will
+            need = estimate(self.formats, self.info.get('duration'))
+            with ADMISSION.admit(need, ADMISSION.directories(self.directory)) as reservation:
+                self.options['progress_hooks'].append(reservation.hook)
+                self.__download()
+        except NotEnoughSpace as e:
+            self._record(FAILED, error=repr(e))
+            self.error = e
+            print(f"Not Enough Space: {e}")
+
+    def _path(self, ext: str = None) -> str:
+        """
+        The file of the download, named the same way whichever way it is downloaded
+        :param ext: Its extension, the path has none if None
+        """
+        name = sanitize_filename(self.filename)
+        return os.path.join(self.directory, name if ext is None else f"{name}.{ext}")
+
+    def _journal_key(self) -> str:
+        return Journal.key(self.id, self.video, self.directory)
+
+    def _is_done(self) -> bool:
+        if JOURNAL is None or not self.id or not JOURNAL.is_done(self._journal_key()):
+            return False
+
+        self.skipped = True
+        print(f"Already downloaded: {JOURNAL.get(self._journal_key())['path']}")
+        return True
+
+    def _from_library(self) -> bool:
+        """Links the file of the same video another folder or playlist already has, True if it did"""
+        if LIBRARY is None or not self.id:
+            return False
+
+        path = LIBRARY.reuse(self.id, self.video, self._path(), _library_ext(self.audio, self.video))
+        if path is None:
+            return False
+
+        self.reused = path
+        self._record(DONE, path=path, bytes=os.path.getsize(path), directory=self.directory)
+        print(f"Already in the library: {path}")
+        return True
+
+    def _record(self, state: str, **fields) -> None:
+        if JOURNAL is not None and self.id:
+            JOURNAL.record(self._journal_key(), state, id=self.id, **fields)
+
+    @metrics.timed(metrics.SELECT)
+    def _choose_format_id(self, video: bool = True):
+        self.formats = select(self.info, video, self.policy)
+        return format_spec(self.formats)
+
+    def _set_options(self, video: bool, progress_hook=None):
+
+        fmt = self._choose_format_id(video)
 
         if video:
             self.options = {
                 'format': fmt if fmt is not None else 'bv*+ba/b',
-                'outtmpl': f"{self.filename}.%(ext)s",
+                'outtmpl': self._path().replace('%', '%%') + '.%(ext)s',
                 'quiet': True,
                 'no_warnings': True,
-                'progress_hooks': [lambda d: None]
+                'noprogress': progress_hook is not None,
+                'progress_hooks': [progress_hook or (lambda d: None)]
             }
         else:
             self.options = {
-                'format': 'bestaudio[ext=m4a]/bestaudio/best',
-                'outtmpl': f"{self.filename}.%(ext)s",
+                'format': fmt if fmt is not None else 'bestaudio[ext=m4a]/bestaudio/best',
+                'outtmpl': self._path().replace('%', '%%') + '.%(ext)s',
                 'quiet': True,
                 'no_warnings': True,
-                'progress_hooks': [lambda d: None]
+                'noprogress': progress_hook is not None,
+                'progress_hooks': [progress_hook or (lambda d: None)]
             }
 
-    def _modify_timestamp(self):
-        current_time = time.time()
+        # .part files of an interrupted run are resumed, finished ones are skipped by yt_dlp itself
+        self.options['continuedl'] = True
+        if video and len(self.formats) == 2:
+            # If yt_dlp merges, it's into the container that takes both codecs as they are
+            self.options['merge_output_format'] = container(self.formats[1], self.formats[0])
+        if JOURNAL is not None:
+            self.options['download_archive'] = JournalArchive(JOURNAL, video, self.directory)
+
+    @metrics.timed(metrics.TIMESTAMP)
+    def _modify_timestamp(self, path: str = None):
+        """
+        Touches the downloaded file, returns its path
+        :param path: The file yt_dlp wrote, looked up by name in the directory index if unknown
+        """
+        name = os.path.basename(self._path())
+        fp = path if path and os.path.exists(path) else directory_index(self.directory).find(name)
+        if fp is None:
+            print(f"Unable to find {self.filename}!")
+            return None
 
-        for file in os.listdir(os.getcwd()):
+        current_time = time.time()
+        try:
+            os.utime(fp, (current_time, current_time))
+        except OSError:
+            pass  # Some storages don't allow it, the file was just written anyway
+        return fp
 
-            if not os.path.isfile(file):
-                continue
+    def __download(self):
+        import yt_dlp  # Heavy, only imported once something is downloaded
+
+        self._record(STARTED, format=self.options['format'], path=None, directory=self.directory)
+        options = SCHEDULER.tune(self.options, self.formats)
+        if metrics.SINK is not None:
+            options = metrics.Hooks(self.url).add_to(options)
+        with metrics.stage(self.url, metrics.DOWNLOAD) as fields:
+            try:
+                if _transcodes(self.audio, self.video, self.formats):
+                    # Only the transcoded file is written, nothing to re-read afterwards
+                    path = _transcode(self.url, self.info, self.formats, self.audio, self._path(self.audio.ext),
+                                      options['progress_hooks'], self.priority)
+                elif _merges(self.video, self.formats):
+                    path = self._modify_timestamp(fetch_and_merge(
+                        self.url, self.info, self.formats, self._path(self.options['merge_output_format']), options,
+                        self.priority
+                    ))
+                elif _segments(self.formats):
+                    path = self._modify_timestamp(
+                        _fetch(self.info, self.formats[0], self._path(self.formats[0]['ext']), options, self.priority)
+                    )
+                else:
+                    # DASH/HLS fragments are fetched over several connections, they count against the per-host cap
+                    with SCHEDULER.transfer(SCHEDULER.host(self.formats, self.url), self.priority,
+                                            options.get('concurrent_fragment_downloads', 1)) as transfer:
+                        options['progress_hooks'] = options['progress_hooks'] + [transfer.hook]
+                        if 'concurrent_fragment_downloads' in options:
+                            options['concurrent_fragment_downloads'] = transfer.connections
+                        with borrow(options) as ydl:
+                            try:
+                                result = ydl.process_ie_result(
+                                    ydl.sanitize_info(self.info, remove_private_keys=True), download=True
+                                )
+                            except yt_dlp.DownloadError as d:
+                                if "Operation not permitted".lower() in str(d).lower():
+                                    raise
+                                # The format urls of the info dict may have expired, same fallback as yt_dlp's --load-info-json
+                                forget(self.url)
+                                result = ydl.extract_info(self.url, download=True)
+                    # The file yt_dlp wrote (after merging/post-processing), no need to look for it
+                    path = self._modify_timestamp(_filepath(result))
+                fields['bytes'] = os.path.getsize(path) if path else None
+                self._record(DONE, path=path, bytes=fields['bytes'])
+                if LIBRARY is not None and self.id and path:
+                    LIBRARY.add(self.id, self.video, settled(path), self.options['format'])
+            except yt_dlp.DownloadError as d:
+                fields['error'] = repr(d)
+                self._record(FAILED, error=repr(d))
+                if "Operation not permitted".lower() in str(d).lower():
+                    raise PermissionError
+                self.error = d
+                print(f"Unable To Download: {repr(d)}")
+            except Exception as e:
+                fields['error'] = repr(e)
+                self._record(FAILED, error=repr(e))
+                self.error = e
+                if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                    print(f"Not Enough Space: {repr(e)}")
+                else:
+                    print(f"Something Went Wrong: {repr(e)}")
+
+
+class PlaylistEntry:
 
-            if os.path.splitext(file)[0] != self.filename:
-                continue
+    """
+    The outcome of downloading one entry of a playlist
+    :param index: The (1-based) index of the entry in the playlist
+    :param entry: The flat entry from the playlist metadata
+    """
 
-            fp = os.path.join(os.getcwd(), file)
-            os.utime(fp, (current_time, current_time))
-            return
+    __slots__ = (
+        'index',
+        'id',
+        'title',
+        'url',
+        'path',
+        'format',
+        'previous',
+        'error',
+        'downloaded'
+    )
 
-        print(f"Unable to find {self.filename}!")
+    def __init__(self, index: int, entry: dict) -> None:
+        self.index = index
+        self.id = entry.get('id')
+        self.title = entry.get('title')
+        self.url = entry.get('url') or entry.get('webpage_url')
+        self.path = None  # The downloaded file
+        self.format = None  # The format spec it was downloaded with
+        self.previous = None  # Its file of an earlier sync, replaced if its formats changed since
+        self.error = None
+        self.downloaded = False
+
+    @property
+    def ok(self) -> bool:
+        return self.downloaded and self.error is None
 
-    def __download(self):
-        try:
-            with yt_dlp.YoutubeDL(self.options) as ydl:
-                ydl.download(self.url)
-            self._modify_timestamp()
-        except yt_dlp.DownloadError as d:
-            if "Operation not permitted".lower() in str(d).lower():
-                raise PermissionError
-            print(f"Unable To Download: {repr(d)}")
-        except Exception as e:
-            print(f"Something Went Wrong: {repr(e)}")
+    def __repr__(self):
+        return f"{self.index}. {self.title}: {'Downloaded' if self.ok else repr(self.error)}"
 
 
 class DownloadPlaylist:
@@ -134,88 +355,71 @@ class DownloadPlaylist:
     Downloads video/audio from a YouTube playlist url!
     :param url: The url of the playlist
     :param video: Whether to download video or audio
+    :param workers: How many entries are downloaded at the same time
+    :param progress_hook: Called with yt_dlp's progress dicts, e.g. Progress.hook
+    :param policy: Limits and preferences for the format selection of every entry
+    :param audio: Transcodes the audio of every entry (streamed into ffmpeg)
+    :param directory: Where the playlist folder is made, the current directory by default
     """
 
     __slots__ = (
         'url',
         'title',
+        'video',
+        'policy',
+        'audio',
         'options',
+        'metadata',
+        'results',
+        'workers',
+        'directory',
         'filename',
         'playlist_url',
-        'playlist_path'
+        'playlist_path',
+        'last_index'
     )
 
-    def __init__(self, url: str, video: bool = False) -> None:
+    def __init__(
+            self, url: str, video: bool = False, workers: int = PLAYLIST_WORKERS, progress_hook=None,
+            policy: FormatPolicy = None, audio: AudioTarget = None, directory: str = None
+    ) -> None:
         self.url = url
+        self.directory = directory or os.getcwd()
         if not is_playlist(self.url):
             raise ValueError('Excepted a playlist url!')
 
+        self.workers = max(1, workers)
+        self.results = {}
+        self.video = video
+        self.policy = policy
+        self.audio = audio
+
         # Sets the options for downloading either a video or audio
-        self._set_options(video)
+        self._set_options(video, progress_hook)
         # Sets the title and playlist url + handles the path generation and validation
-        self._set_title_and_playlist_url(self._get_metadata())
-
-    def _choose_format_id(self):
-        ydl_opts = {
-            'format': 'all',
-            'listformats': False,
-            'quiet': True
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(self.url, download=False)
-
-        fmts = info.get('formats', None)
-
-        if not fmts:
-            return None
-
-        audio = {}
-        audio_end_index = 0
-        for idx, a in enumerate(fmts, start=1):
-            if ('audio only' in a.get('format').lower()) and (a.get('abr', 0) not in [0, None]):
-                audio[len(audio) + 1] = a
-                audio_end_index = idx
-
-        video = {}
-        for idx, v in enumerate(fmts, start=1):
-            if idx <= audio_end_index:
-                continue
-            if (v.get('height', 0) == 0) or (v.get('vbr', 0) == 0):
-                continue
-            video[len(video) + 1] = v
-
-        high_video = max(video.values(), key=lambda a: (a.get('vbr', 0), a.get('height', 0)))
-        high_audio = max(audio.values(), key=lambda a: a.get('abr', 0))
-
-        return f"{high_audio['format_id']}+{high_video['format_id']}"
+        self.metadata = self._get_metadata()
+        self._set_title_and_playlist_url(self.metadata)
 
     def _get_metadata(self):
-        opts = {
-            'quiet': True,  # Disable verbose output
-            'no_warnings': True,  # Suppress warnings
-            'extract_flat': True,  # Only extract metadata, no full processing
-            'skip_download': True  # Do not download any content
-        }
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(self.url, download=False)
-            return info
+        # Only the first page, the entries are enumerated while they're downloaded
+        metadata, entries = iter_playlist(self.url)
+        metadata['entries'] = entries
+        return metadata
 
     def _set_title_and_playlist_url(self, metadata: dict):
         self.title = metadata.get('title')
-        self.playlist_url = metadata.get('url')
+        self.playlist_url = metadata.get('webpage_url', self.url)
         self._set_paths()
 
-    def _set_options(self, video: bool):
-
-        fmt = self._choose_format_id().get('format_id', None)
+    def _set_options(self, video: bool, progress_hook=None):
 
         if video:
             self.options = {
-                'format': 'bestvideo+bestaudio/best' if not fmt else fmt,
+                'format': 'bestvideo+bestaudio/best',
                 'quiet': True,
                 'no_warnings': True,
-                'progress_hooks': [lambda d: None],
+                'noprogress': progress_hook is not None,
+                'progress_hooks': [progress_hook or (lambda d: None)],
                 'noplaylist': False
             }
         else:
@@ -223,30 +427,299 @@ class DownloadPlaylist:
                 'format': 'bestaudio[ext=m4a]/bestaudio/best',
                 'quiet': True,
                 'no_warnings': True,
-                'progress_hooks': [lambda d: None],
+                'noprogress': progress_hook is not None,
+                'progress_hooks': [progress_hook or (lambda d: None)],
                 'noplaylist': False
             }
 
     def _set_paths(self):
         self.filename = sanitize_filename(self.title) if is_windows else self.title
-        self.playlist_path = os.path.join(os.getcwd(), self.filename + '-playlist')
+        self.playlist_path = os.path.join(self.directory, self.filename + '-playlist')
 
         # makes the download path
         os.makedirs(self.playlist_path, exist_ok=True)
 
+        # The index is padded for the entry count the folder's files were first named with, so a playlist that
+        # grew past 9, 99... keeps naming its entries alike, whatever the count is now
+        self.last_index = Manifest(self.playlist_path).playlist.get(
+            'last_index', self.metadata.get('playlist_count') or 0
+        )
+
         # adds the paths to self.options
         self.options['outtmpl'] = f"{self.playlist_path}/%(playlist_index)s - %(title)s.%(ext)s"
+        self.options['continuedl'] = True
+        if JOURNAL is not None:
+            self.options['download_archive'] = JournalArchive(JOURNAL, self.video, self.playlist_path)
+
+    def _extra_info(self, entry: PlaylistEntry) -> dict:
+        # Same fields yt_dlp sets while processing a playlist, so the outtmpl stays as it is
+        return {
+            'playlist': self.title,
+            'playlist_id': self.metadata.get('id'),
+            'playlist_title': self.title,
+            'playlist_index': entry.index,
+            '__last_playlist_index': self.last_index
+        }
+
+    def _playlist_record(self) -> dict:
+        # What the manifest keeps of the playlist itself
+        return {
+            'id': self.metadata.get('id'),
+            'title': self.title,
+            'url': self.playlist_url,
+            'last_index': self.last_index
+        }
 
-    def download(self):
+    def _download_entry(self, entry: PlaylistEntry) -> PlaylistEntry:
+        extra_info = self._extra_info(entry)
+        key = Journal.key(entry.id, self.video, self.playlist_path) if JOURNAL is not None and entry.id else None
+        if key and entry.previous is None and JOURNAL.is_done(key):
+            record = JOURNAL.get(key)
+            entry.error = None
+            entry.downloaded = True
+            entry.path, entry.format = record['path'], record.get('format')
+            return entry
+
+        import yt_dlp
+
+        with metrics.stage(entry.url, metrics.DOWNLOAD, index=entry.index) as fields:
+            try:
+                # Asked before the extraction, a video the library has costs no request at all
+                if entry.previous is None and self._from_library(entry, extra_info, key):
+                    return entry
+
+                if entry.previous is not None:
+                    forget(entry.url)  # A cached info dict has the formats of back then
+                # Not kept for the session, a 10k entry channel would keep 10k info dicts alive
+                info = get_info(entry.url, keep=False)
+                # Ranked per entry from its own info dict, the generic format string is only a fallback
+                with metrics.stage(entry.url, metrics.SELECT):
+                    formats = select(info, self.video, self.policy)
+                options = SCHEDULER.tune(self.options, formats)
+                if metrics.SINK is not None:
+                    options = metrics.Hooks(entry.url).add_to(options)
+                options['format'] = format_spec(formats) or options['format']
+                if entry.previous is not None:
+                    if entry.format in (None, options['format']):
+                        # Still what it was downloaded as (or unknown, synced before formats were recorded)
+                        entry.error = None
+                        entry.downloaded = True
+                        entry.path, entry.format = entry.previous, options['format']
+                        return entry
+                    # Changed upstream, the journal would skip it and yt_dlp would keep a file of the same name
+                    options.pop('download_archive', None)
+                    options['overwrites'] = True
+                if self.video and len(formats) == 2:
+                    options['merge_output_format'] = container(formats[1], formats[0])
+                if key:
+                    JOURNAL.record(key, STARTED, id=entry.id, format=options['format'], path=None,
+                                   directory=self.playlist_path)
+                # Held until the formats fit on the disk, NotEnoughSpace if they never will
+                need = estimate(formats, info.get('duration'))
+                with ADMISSION.admit(need, ADMISSION.directories(self.playlist_path)) as reservation:
+                    options['progress_hooks'] = options['progress_hooks'] + [reservation.hook]
+                    if _transcodes(self.audio, self.video, formats):
+                        # Same name the outtmpl gives, with the extension of the target
+                        with borrow(options) as ydl:
+                            path = ydl.prepare_filename(dict(info, **extra_info, ext=self.audio.ext))
+                        path = _transcode(entry.url, info, formats, self.audio, path, options['progress_hooks'],
+                                          BULK)
+                    elif _merges(self.video, formats):
+                        with borrow(options) as ydl:
+                            path = ydl.prepare_filename(
+                                dict(info, **extra_info, ext=options['merge_output_format'])
+                            )
+                        path = fetch_and_merge(entry.url, info, formats, path, options, BULK)
+                    elif _segments(formats):
+                        with borrow(options) as ydl:
+                            path = ydl.prepare_filename(dict(info, **extra_info, ext=formats[0]['ext']))
+                        path = _fetch(info, formats[0], path, options, BULK)
+                    else:
+                        # Playlist entries queue behind single downloads
+                        with SCHEDULER.transfer(SCHEDULER.host(formats, entry.url), BULK,
+                                                options.get('concurrent_fragment_downloads', 1)) as transfer:
+                            options['progress_hooks'] = options['progress_hooks'] + [transfer.hook]
+                            if 'concurrent_fragment_downloads' in options:
+                                options['concurrent_fragment_downloads'] = transfer.connections
+                            with borrow(options) as ydl:
+                                result = ydl.process_ie_result(
+                                    ydl.sanitize_info(info, remove_private_keys=True), download=True,
+                                    extra_info=extra_info
+                                )
+                        path = _filepath(result)
+                entry.error = None
+                entry.downloaded = True
+                entry.path, entry.format = path, options['format']
+                fields['bytes'] = os.path.getsize(path) if path and os.path.exists(path) else None
+                if key and path:
+                    JOURNAL.record(key, DONE, path=path, bytes=fields['bytes'])
+                if LIBRARY is not None and entry.id and path:
+                    LIBRARY.add(entry.id, self.video, settled(path), options['format'])
+            except Exception as e:
+                entry.error = e
+                fields['error'] = repr(e)
+                if key:
+                    JOURNAL.record(key, FAILED, error=repr(e))
+        return entry
+
+    def _from_library(self, entry: PlaylistEntry, extra_info: dict, key: str = None) -> bool:
+        """Links the file of the entry another folder or playlist already has, True if it did"""
+        if LIBRARY is None or not entry.id:
+            return False
+
+        # Same name the outtmpl gives, from the flat entry so nothing is extracted, the extension is the library's
+        with borrow(self.options) as ydl:
+            stem = os.path.splitext(ydl.prepare_filename(
+                dict(extra_info, id=entry.id, title=entry.title or entry.id, ext='')
+            ))[0]
+        path = LIBRARY.reuse(entry.id, self.video, stem, _library_ext(self.audio, self.video))
+        if path is None:
+            return False
+
+        print(f"Already in the library: {path}")
+        entry.error = None
+        entry.downloaded = True
+        entry.path = path
+        if key:
+            JOURNAL.record(key, DONE, id=entry.id, path=path, bytes=os.path.getsize(path), directory=self.playlist_path)
+        return True
+
+    def _entries(self) -> Iterator[PlaylistEntry]:
+        """
+        The entries in playlist order, new ones as the enumeration yields them
+        The enumeration is only walked once, self.results remembers what it yielded
+        """
+        yield from sorted(self.results.values(), key=lambda e: e.index)
+
+        entries = self.metadata.get('entries')
+        if entries is None:
+            return
+        for e in entries:
+            idx = len(self.results) + 1
+            self.results[idx] = PlaylistEntry(e.get('playlist_index') or idx, e)
+            yield self.results[idx]
+        self.metadata['entries'] = None
+
+    def _run(self, entries: Iterable[PlaylistEntry], on_done=None) -> None:
+        """
+        Downloads the entries that aren't done yet on a pool of workers, while they're still being enumerated
+        Only a few entries are in flight at once, on_done is called (on this thread) for each downloaded one
+        """
+        import yt_dlp
+
+        not_permitted = False
+
+        def finish(futures) -> None:
+            nonlocal not_permitted
+            for future in futures:
+                entry = future.result()
+                if not entry.ok:
+                    print(f"Unable To Download: {entry!r}")
+                    not_permitted = not_permitted or (
+                        isinstance(entry.error, yt_dlp.DownloadError)
+                        and "Operation not permitted".lower() in str(entry.error).lower()
+                    )
+                elif on_done is not None:
+                    on_done(entry)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="Playlist") as pool:
+            in_flight = set()
+            for entry in entries:
+                if entry.ok:
+                    continue
+                in_flight.add(pool.submit(self._download_entry, entry))
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    finish(done)
+            finish(as_completed(in_flight))
+
+        if not_permitted:
+            raise PermissionError
+
+    def download(self) -> list[PlaylistEntry]:
+        """Downloads the entries on a pool of workers as they're enumerated, entries already downloaded are skipped"""
+        manifest = Manifest(self.playlist_path)
+        if 'last_index' not in manifest.playlist:
+            # Remembers the padding for the next run, the entries are only tracked by sync
+            manifest.playlist = self._playlist_record()
+            manifest.save()
+        self._run(self._entries())
+        return sorted(self.results.values(), key=lambda e: e.index)
+
+    def sync(self, prune: bool = False, refresh: bool = False) -> list[PlaylistEntry]:
+        """
+        Only downloads the entries the manifest of playlist_path doesn't have (new ones, or ones whose file is gone)
+        Entries keep the file they were downloaded to when their index changes, a changed title renames it
+        :param prune: Whether the files of entries removed from the playlist are deleted
+        :param refresh: Whether the entries it has are extracted again, and downloaded again if their formats changed
+        """
+        manifest = Manifest(self.playlist_path)
+        manifest.playlist = self._playlist_record()
+        ids = set()
+
+        def known(entries: Iterable[PlaylistEntry]) -> Iterator[PlaylistEntry]:
+            # Entries the manifest has are done without a download, unless they're refreshed
+            for e in entries:
+                if e.id:
+                    ids.add(e.id)
+                existing = manifest.file(e.id, self.video) if e.id else None
+                if existing is not None:
+                    e.path = self._retitle(manifest, e, existing)
+                    e.format = manifest.get(e.id, self.video).get('format')
+                    if refresh:
+                        e.previous = e.path
+                    else:
+                        e.error, e.downloaded = None, True
+                yield e
+
+        def done(entry: PlaylistEntry) -> None:
+            if entry.id and entry.path:
+                if entry.previous is not None and settled(entry.path) != entry.previous:
+                    # Downloaded again under another name (e.g. another container), the old file is replaced
+                    try:
+                        os.remove(entry.previous)
+                        print(f"Replaced: {entry.previous}")
+                    except OSError:
+                        pass
+                manifest.add(entry.id, self.video, entry.path, entry.title, entry.index, entry.format)
+                # Saved after every entry, an interrupted sync doesn't lose what it fetched
+                manifest.save()
+
+        self._run(known(self._entries()), done)
+
+        if prune:
+            for path in manifest.prune(ids, self.video):
+                print(f"Removed: {path}")
+        manifest.save()
+
+        return sorted(self.results.values(), key=lambda e: e.index)
+
+    def _retitle(self, manifest: Manifest, entry: PlaylistEntry, path: str) -> str:
+        """Renames the file of an entry whose title changed upstream to the name it gets now, returns its path"""
+        title = manifest.get(entry.id, self.video).get('title')
+        if not entry.title or title is None or title == entry.title:
+            manifest.update(entry.id, self.video, entry.title or title, entry.index)
+            return path
+
+        ext = os.path.splitext(path)[1].lstrip('.')
+        with borrow(self.options) as ydl:
+            name = os.path.basename(ydl.prepare_filename(
+                dict(self._extra_info(entry), id=entry.id, title=entry.title, ext=ext)
+            ))
+        target = os.path.join(os.path.dirname(path), name)
         try:
-            with yt_dlp.YoutubeDL(self.options) as ydl:
-                ydl.download(self.playlist_url)
-        except yt_dlp.DownloadError as d:
-            if "Operation not permitted".lower() in str(d).lower():
-                raise PermissionError
-            print(f"Unable To Download: {repr(d)}")
-        except Exception as e:
-            print(f"Something Went Wrong: {repr(e)}")
+            if os.path.exists(target):
+                raise FileExistsError(target)
+            os.replace(path, target)
+        except OSError as e:
+            # The old title is kept, the next sync tries again
+            print(f"Unable to rename {path}: {repr(e)}")
+            manifest.update(entry.id, self.video, title, entry.index)
+            return path
+
+        print(f"Renamed: {os.path.basename(path)} -> {name}")
+        manifest.update(entry.id, self.video, entry.title, entry.index, target)
+        return target
 
     def __repr__(self):
         return f"Downloading: {self.title} in {self.playlist_path}"
@@ -0,0 +1,146 @@
+from typing import Optional
+
+# Containers and the audio extensions that can be merged into them without a re-encode
+AUDIO_FOR_CONTAINER = {
+    'mp4': ('m4a', 'mp4'),
+    'webm': ('webm',),
+}
+
+
+class FormatPolicy:
+
+    """
+    Rules for picking the formats of a video
+    :param max_height: Highest video resolution (e.g. 1080), None for no limit
+    :param codecs: Preferred video codecs in order, e.g. ('avc1', 'vp9', 'av01')
+    :param container: Preferred container ('mp4', 'webm'), also steers the audio codec (m4a if None)
+    :param max_bitrate: Ceiling for the total bitrate (kbit/s) of the chosen formats
+    :param max_bytes: Bandwidth budget, the most bytes the chosen formats may add up to
+    """
+
+    __slots__ = (
+        'max_height',
+        'codecs',
+        'container',
+        'max_bitrate',
+        'max_bytes'
+    )
+
+    def __init__(
+            self,
+            max_height: int = None,
+            codecs: tuple = (),
+            container: str = None,
+            max_bitrate: float = None,
+            max_bytes: int = None
+    ) -> None:
+        self.max_height = max_height
+        self.codecs = tuple(c.lower() for c in codecs)
+        self.container = container
+        self.max_bitrate = max_bitrate
+        self.max_bytes = max_bytes
+
+    def codec_rank(self, codec: str) -> int:
+        """Lower is better, codecs not in the preference list come last"""
+        codec = (codec or '').lower()
+        for idx, preferred in enumerate(self.codecs):
+            if codec.startswith(preferred):
+                return idx
+        return len(self.codecs)
+
+
+def bitrate(fmt: dict) -> float:
+    return fmt.get('tbr') or ((fmt.get('vbr') or 0) + (fmt.get('abr') or 0))
+
+
+def size(fmt: dict, duration: float = None) -> Optional[float]:
+    """The (approximate) size of the format in bytes, None if unknown"""
+    known = fmt.get('filesize') or fmt.get('filesize_approx')
+    if known:
+        return known
+    if duration and bitrate(fmt):
+        return bitrate(fmt) * 1000 / 8 * duration
+    return None
+
+
+def _kind(fmt: dict) -> Optional[str]:
+    vcodec, acodec = fmt.get('vcodec'), fmt.get('acodec')
+    if vcodec == 'none' and acodec not in (None, 'none'):
+        return 'audio' if fmt.get('abr') else None
+    if acodec == 'none' and vcodec not in (None, 'none'):
+        return 'video' if fmt.get('height') else None
+    if vcodec not in (None, 'none') and acodec not in (None, 'none'):
+        return 'muxed'
+    return None
+
+
+def rank(info: dict, policy: FormatPolicy = None) -> tuple[list, list, list]:
+    """
+    Splits the formats of an info dict into audio only, video only and muxed formats, best first
+    Everything outside the policy's limits is dropped in the same (single) pass
+    """
+    policy = policy or FormatPolicy()
+    audio_exts = AUDIO_FOR_CONTAINER.get(policy.container, ('m4a',))
+    scored = {'audio': [], 'video': [], 'muxed': []}
+
+    for fmt in info.get('formats') or []:
+        kind = _kind(fmt)
+        if kind is None:
+            continue
+
+        if kind != 'audio':
+            if policy.max_height and (fmt.get('height') or 0) > policy.max_height:
+                continue
+            key = (
+                fmt.get('height') or 0,
+                -policy.codec_rank(fmt.get('vcodec')),
+                fmt.get('ext') == policy.container,
+                fmt.get('fps') or 0,
+                bitrate(fmt)
+            )
+        else:
+            key = (fmt.get('ext') in audio_exts, -policy.codec_rank(fmt.get('acodec')), fmt.get('abr') or 0)
+
+        if policy.max_bitrate and bitrate(fmt) > policy.max_bitrate:
+            continue
+
+        scored[kind].append((key, fmt))
+
+    return tuple([f for _, f in sorted(scored[k], key=lambda s: s[0], reverse=True)]
+                 for k in ('audio', 'video', 'muxed'))
+
+
+def _fits(formats: list, policy: FormatPolicy, duration: float) -> bool:
+    if policy.max_bitrate and sum(bitrate(f) for f in formats) > policy.max_bitrate:
+        return False
+    if policy.max_bytes:
+        sizes = [size(f, duration) for f in formats]
+        if None not in sizes and sum(sizes) > policy.max_bytes:
+            return False
+    return True
+
+
+def select(info: dict, video: bool = True, policy: FormatPolicy = None) -> list[dict]:
+    """
+    Picks the formats to download from an already extracted info dict
+    :return: [audio, video], [muxed] or [audio] (audio only) - empty if nothing fits the policy
+    """
+    policy = policy or FormatPolicy()
+    duration = info.get('duration')
+    audio, videos, muxed = rank(info, policy)
+
+    if not video:
+        return next(([a] for a in audio if _fits([a], policy, duration)), [])
+
+    # The best video is walked down until the pair fits the budget
+    for v in videos:
+        for a in audio:
+            if _fits([a, v], policy, duration):
+                return [a, v]
+
+    return next(([m] for m in muxed if _fits([m], policy, duration)), [])
+
+
+def format_spec(formats: list[dict]) -> Optional[str]:
+    """The yt_dlp format string of the selected formats"""
+    return '+'.join(f['format_id'] for f in formats) if formats else None
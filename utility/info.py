@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from typing import Iterator
+
+from . import metrics
+from .cache import MetadataCache
+from .pool import BASE_OPTIONS, borrow
+from .urls import classify
+
+CACHE: MetadataCache = None  # Persistent cache shared between sessions, set by the caller
+PAGE_SIZE = 100  # Entries fetched at once from playlists that are paged by index
+MAX_INFOS = 256  # Urls whose info dict is kept in memory, the least recently used one goes first
+_INFOS = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _key(url: str, flat: bool) -> tuple:
+    return url.strip(), flat
+
+
+def _cache_key(url: str, flat: bool):
+    """Key of the url in the persistent CACHE, None for non YouTube urls"""
+    parsed = classify(url)
+    if flat:
+        return f"playlist:{parsed.playlist_id}" if parsed.playlist_id else None
+    return f"video:{parsed.video_id}" if parsed.video_id else None
+
+
+def remember(url: str, info: dict, flat: bool = False) -> None:
+    """Stores an extracted info dict under every url it is known by"""
+    with _LOCK:
+        for u in {url, info.get('webpage_url'), info.get('original_url')}:
+            if u:
+                _INFOS[_key(u, flat)] = info
+                _INFOS.move_to_end(_key(u, flat))
+        # Bounded, a long-lived process (the daemon) doesn't keep every video it ever saw
+        while len(_INFOS) > MAX_INFOS:
+            _INFOS.popitem(last=False)
+
+
+def forget(url: str) -> None:
+    """Drops the cached info dict(s) of the url, e.g. when the format urls expired"""
+    with _LOCK:
+        for flat in (True, False):
+            key = _cache_key(url, flat)
+            if CACHE is not None and key:
+                CACHE.delete(key)
+
+            info = _INFOS.pop(_key(url, flat), None)
+            if info is None:
+                continue
+            for k in [k for k, v in _INFOS.items() if v is info]:
+                del _INFOS[k]
+
+
+def get_info(url: str, flat: bool = False, keep: bool = True) -> dict:
+    """
+    Extracts the info dict of an url, but only once per session!
+    :param url: The url of the video/playlist
+    :param flat: Whether to only extract the entries of a playlist (no full processing)
+    :param keep: Whether it is kept in memory for the rest of the session, not worth it for what is only needed once
+    """
+    with _LOCK:
+        info = _INFOS.get(_key(url, flat))
+        if info is not None:
+            _INFOS.move_to_end(_key(url, flat))
+
+    if info is not None:
+        return info
+
+    key = _cache_key(url, flat) if CACHE is not None else None
+    if key:
+        info = CACHE.get(key)
+        if info is not None:
+            if keep:
+                remember(url, info, flat)
+            return info
+
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True
+    }
+    if flat:
+        opts['extract_flat'] = True
+
+    # The YoutubeDL of this thread, its connections are reused for every extraction
+    with metrics.stage(url, metrics.EXTRACT, flat=flat), borrow(opts) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    if key:
+        CACHE.put(key, info)
+    if keep:
+        remember(url, info, flat)
+    return info
+
+
+def _pages(entries) -> Iterator[dict]:
+    """Entries of a playlist as yt_dlp gives them unprocessed: a generator, a list or a PagedList"""
+    from yt_dlp.utils import PagedList
+
+    if not isinstance(entries, PagedList):
+        yield from entries or ()
+        return
+
+    # playliststart-playlistend like windows, one page in flight at a time
+    start = 0
+    while True:
+        page = entries.getslice(start, start + PAGE_SIZE)
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def iter_playlist(url: str) -> tuple[dict, Iterator[dict]]:
+    """
+    Enumerates a playlist (or channel) lazily, nothing but the first page is fetched before the entries are iterated
+    Neither is cached, a playlist with thousands of entries never is in memory at once
+    :param url: The url of the playlist
+    :return: The info dict of the playlist (without its entries) and a generator of its flat entries, in order
+    """
+    import yt_dlp
+
+    opts = {
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True
+    }
+    # Its own YoutubeDL, the generator outlives any borrow and may be iterated while this thread borrows
+    ydl = yt_dlp.YoutubeDL(dict(BASE_OPTIONS, **opts))
+    try:
+        with metrics.stage(url, metrics.EXTRACT, flat=True, lazy=True):
+            info = ydl.extract_info(url, download=False, process=False)
+            # Channels and the like redirect to the actual playlist
+            for _ in range(5):
+                if info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    except BaseException:
+        ydl.close()
+        raise
+
+    entries = info.pop('entries', None)
+
+    def generate() -> Iterator[dict]:
+        try:
+            for entry in _pages(entries):
+                if entry:
+                    yield entry
+        finally:
+            ydl.close()
+
+    return info, generate()
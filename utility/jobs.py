@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+
+    """
+    A download submitted to the daemon
+    :param row: The row of the jobs table
+    """
+
+    __slots__ = (
+        'id',
+        'query',
+        'video',
+        'destination',
+        'state',
+        'title',
+        'error',
+        'created',
+        'started',
+        'finished'
+    )
+
+    COLUMNS = __slots__
+
+    def __init__(self, row: tuple) -> None:
+        for name, value in zip(self.COLUMNS, row):
+            setattr(self, name, value)
+        self.video = bool(self.video)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+
+class JobQueue:
+
+    """
+    Persistent (SQLite) queue of download jobs, jobs survive a restart of the daemon
+    :param path: The path of the SQLite database
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+        self._available = threading.Condition()
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                with conn:
+                    if not self._ready:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS jobs ("
+                            "id TEXT PRIMARY KEY, query TEXT NOT NULL, video INTEGER NOT NULL, destination TEXT, "
+                            "state TEXT NOT NULL, title TEXT, error TEXT, "
+                            "created REAL NOT NULL, started REAL, finished REAL)"
+                        )
+                        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)")
+                        self._ready = True
+                    yield conn
+            finally:
+                conn.close()
+
+    def recover(self) -> int:
+        """Jobs that were running when the daemon stopped are queued again, returns how many"""
+        with self._connection() as conn:
+            count = conn.execute("UPDATE jobs SET state = ?, started = NULL WHERE state = ?", (QUEUED, RUNNING)).rowcount
+        self._notify()
+        return count
+
+    def submit(self, query: str, video: bool = False, destination: str = None) -> Job:
+        job = (uuid.uuid4().hex[:12], query, int(video), destination, QUEUED, None, None, time.time(), None, None)
+        with self._connection() as conn:
+            conn.execute(f"INSERT INTO jobs ({', '.join(Job.COLUMNS)}) VALUES ({', '.join('?' * len(job))})", job)
+        self._notify()
+        return Job(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(Job.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row else None
+
+    def list(self, state: str = None, limit: int = 100) -> list[Job]:
+        """The latest jobs first"""
+        query = f"SELECT {', '.join(Job.COLUMNS)} FROM jobs"
+        args = ()
+        if state:
+            query += " WHERE state = ?"
+            args = (state,)
+        with self._connection() as conn:
+            rows = conn.execute(query + " ORDER BY created DESC LIMIT ?", args + (limit,)).fetchall()
+        return [Job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued job, running ones can't be cancelled"""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            ).rowcount > 0
+
+    def _claim(self) -> Optional[Job]:
+        with self._connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(Job.COLUMNS)} FROM jobs WHERE state = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET state = ?, started = ? WHERE id = ?", (RUNNING, time.time(), row[0]))
+        job = Job(row)
+        job.state = RUNNING
+        return job
+
+    def next(self, timeout: float = None) -> Optional[Job]:
+        """Takes the oldest queued job (marks it running), waits up to timeout for one, None if there is none"""
+        with self._available:
+            job = self._claim()
+            if job is None and self._available.wait(timeout):
+                job = self._claim()
+            return job
+
+    def finish(self, job: Job, error: str = None, title: str = None) -> None:
+        job.state, job.error, job.title, job.finished = FAILED if error else DONE, error, title, time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, title = ?, finished = ? WHERE id = ?",
+                (job.state, job.error, job.title, job.finished, job.id)
+            )
+
+    def _notify(self) -> None:
+        with self._available:
+            self._available.notify_all()
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from .relocate import settled
+
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Journal:
+
+    """
+    Append-only (JSON lines) record of every download, so an interrupted session can skip finished work
+    :param path: The path of the journal file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records = None  # key -> latest record, loaded on first use
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(video_id: str, video: bool, directory: str) -> str:
+        """
+        The same video can be downloaded as audio and as video, and into many directories
+        A work-around temp folder counts as the directory its files are moved into
+        """
+        return f"{video_id}:{'video' if video else 'audio'}:{settled(directory)}"
+
+    def _load(self) -> None:
+        if self.records is not None:
+            return
+
+        self.records = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut off by a crash
+                    self.records[record['key']] = record
+                    lines += 1
+
+        # Keeps the file from growing forever, only the latest record of a key matters
+        if lines > 2 * len(self.records) + 100:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            for record in self.records.values():
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            self._load()
+            return self.records.get(key)
+
+    def finished(self) -> list[dict]:
+        """The latest record of every finished download"""
+        with self._lock:
+            self._load()
+            return [record for record in self.records.values() if record['state'] == DONE]
+
+    def is_done(self, key: str) -> bool:
+        """Whether the download finished and its file is still there"""
+        record = self.get(key)
+        return bool(record and record['state'] == DONE and record.get('path') and os.path.exists(record['path']))
+
+    def record(self, key: str, state: str, **fields) -> dict:
+        """
+        Appends a record, fields of the previous record of the key are kept
+        :param key: See Journal.key
+        :param state: STARTED, DONE or FAILED
+        :param fields: id, format, path, bytes, error... the path and directory are recorded where they end up
+        """
+        for field in ('path', 'directory'):
+            if fields.get(field):
+                fields[field] = settled(fields[field])
+        with self._lock:
+            self._load()
+            record = dict(self.records.get(key) or {}, **fields, key=key, state=state, time=time.time())
+            self.records[key] = record
+
+            os.makedirs(os.path.split(self.path)[0] or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            return record
+
+
+class JournalArchive:
+
+    """
+    A yt_dlp 'download_archive' backed by the journal, yt_dlp skips what the journal has finished
+    :param journal: The journal
+    :param video: Whether video or audio is downloaded
+    :param directory: The directory the files are downloaded to
+    """
+
+    def __init__(self, journal: Journal, video: bool, directory: str) -> None:
+        self.journal = journal
+        self.video = video
+        self.directory = directory
+
+    def __contains__(self, archive_id: str) -> bool:
+        # yt_dlp archive ids look like "<extractor> <video id>"
+        return self.journal.is_done(Journal.key(archive_id.split(' ', 1)[-1], self.video, self.directory))
+
+    def __bool__(self) -> bool:
+        return True
+
+    def add(self, archive_id: str) -> None:
+        # The download records itself as DONE once it knows the final path
+        pass
@@ -0,0 +1,248 @@
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from .manifest import MANIFEST_FILE_NAME, Manifest
+from .relocate import settled, unsettled
+
+SKIP = 'skip'  # The file stays where it is, nothing is written
+HARDLINK = 'hardlink'  # Falls back to a reflink/copy across filesystems
+REFLINK = 'reflink'  # Copy-on-write clone (btrfs, xfs, apfs...), falls back to a copy
+MODES = (SKIP, HARDLINK, REFLINK)
+
+FICLONE = 0x40049409  # linux/fs.h
+HASH_CHUNK = 1024 * 1024
+
+
+def content_hash(path: str) -> str:
+    """blake2b of the file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink(source: str, target: str) -> None:
+    """Clones source into target without copying its blocks, OSError where the filesystem can't"""
+    import fcntl  # Not on Windows, the ImportError means no reflinks there
+
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def place(source: str, target: str, mode: str) -> None:
+    """Makes target the same file as source: a hardlink, a reflink or (if neither works) a copy"""
+    if mode == HARDLINK:
+        try:
+            return os.link(source, target)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+    try:
+        return reflink(source, target)
+    except (OSError, ImportError):
+        pass
+    shutil.copyfile(source, target)
+
+
+class Library:
+
+    """
+    Persistent (SQLite) index of the downloaded files: video id, audio/video, format, path, size and an optional
+    content hash. Built incrementally from the manifests and the journal of the folders under root, and updated
+    by every finished download, so the same video is only downloaded once no matter how many playlists have it
+    :param path: The path of the SQLite database
+    :param root: The download root, it and the folders right under it are scanned
+    :param mode: What is done with a duplicate (SKIP, HARDLINK or REFLINK)
+    :param hashing: Whether the content hash of every file is stored (reads every file once)
+    """
+
+    def __init__(self, path: str, root: str = None, mode: str = HARDLINK, hashing: bool = False) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.path = path
+        self.root = root
+        self.mode = mode
+        self.hashing = hashing
+        self.journal = None  # The download journal, its finished records count as library files
+        self._scanned = None  # The root the index was last brought up to date with
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connection(self):
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                with conn:
+                    if not self._ready:
+                        conn.execute(
+                            "CREATE TABLE IF NOT EXISTS files ("
+                            "path TEXT PRIMARY KEY, directory TEXT NOT NULL, id TEXT NOT NULL, video INTEGER NOT NULL, "
+                            "format TEXT, size INTEGER NOT NULL, mtime REAL NOT NULL, hash TEXT, added REAL NOT NULL)"
+                        )
+                        conn.execute("CREATE INDEX IF NOT EXISTS files_id ON files (id, video)")
+                        conn.execute("CREATE INDEX IF NOT EXISTS files_directory ON files (directory)")
+                        conn.execute("CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime INTEGER)")
+                        self._ready = True
+                    yield conn
+            finally:
+                conn.close()
+
+    def _row(self, path: str, video_id: str, video: bool, fmt: str = None, previous: tuple = None) -> Optional[tuple]:
+        # Indexed under where the file ends up once its work directory is moved, read where it is now
+        stored = settled(path)
+        current = unsettled(stored)
+        try:
+            stat = os.stat(current)
+        except OSError:
+            return None
+        digest = None
+        if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+            digest = previous[2]  # Unchanged, no need to read it again
+        elif self.hashing:
+            digest = content_hash(current)
+        return (stored, os.path.dirname(stored), video_id, int(video), fmt, stat.st_size, stat.st_mtime, digest,
+                time.time())
+
+    def add(self, video_id: str, video: bool, path: str, fmt: str = None) -> None:
+        """Indexes a finished download, under the path it settles at if it's still in a work directory"""
+        path = os.path.abspath(path)
+        row = self._row(path, video_id, video, fmt)
+        if row is None:
+            return
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    @staticmethod
+    def _known(directory: str, journal_records: dict) -> Iterable[tuple]:
+        """(id, video, path, format) of the files the manifest and the journal know in directory"""
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE_NAME)):
+            manifest = Manifest(directory)
+            for key, record in manifest.entries.items():
+                if record.get('id') and record.get('file'):
+                    path = os.path.join(directory, record['file'])
+                    yield record['id'], key.endswith(':video'), path, record.get('format')
+
+        for record in journal_records.get(directory, ()):
+            yield record['id'], record['key'].split(':')[1] == 'video', record['path'], record.get('format')
+
+    def _scan_directory(self, conn, directory: str, journal_records: dict) -> None:
+        previous = {
+            row[0]: row[1:]
+            for row in conn.execute("SELECT path, size, mtime, hash FROM files WHERE directory = ?", (directory,))
+        }
+        rows = {}
+        for video_id, video, path, fmt in self._known(directory, journal_records):
+            path = os.path.abspath(path)
+            row = self._row(path, video_id, video, fmt, previous.get(path))
+            if row is not None:
+                rows[path] = row
+
+        gone = [(path,) for path in previous if path not in rows and not os.path.exists(unsettled(path))]
+        conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows.values())
+
+    def scan(self, root: str = None) -> None:
+        """Brings the index up to date with root and the folders right under it, unchanged folders are skipped"""
+        root = os.path.abspath(root or self.root or os.getcwd())
+        directories = [root]
+        try:
+            with os.scandir(root) as it:
+                directories += [entry.path for entry in it if entry.is_dir() and not entry.name.startswith('.')]
+        except OSError:
+            return
+
+        journal_records = {}  # directory -> finished records
+        for record in (self.journal.finished() if self.journal is not None else ()):
+            if record.get('id') and record.get('path'):
+                journal_records.setdefault(os.path.dirname(os.path.abspath(record['path'])), []).append(record)
+
+        with self._connection() as conn:
+            mtimes = dict(conn.execute("SELECT path, mtime FROM directories"))
+            for directory in directories:
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                if mtimes.get(directory) == mtime:
+                    continue
+                self._scan_directory(conn, directory, journal_records)
+                conn.execute("INSERT OR REPLACE INTO directories VALUES (?, ?)", (directory, mtime))
+
+    def _ensure_scanned(self) -> None:
+        root = os.path.abspath(self.root or os.getcwd())
+        with self._scan_lock:
+            if self._scanned != root:
+                self.scan(root)
+                self._scanned = root
+
+    def find(self, video_id: str, video: bool, ext: str = None) -> Optional[str]:
+        """
+        The path of a file of the video that still is what was indexed, None if the library has none
+        :param ext: Only files with this extension (e.g. the target of a transcode), any if None
+        """
+        self._ensure_scanned()
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime, hash FROM files WHERE id = ? AND video = ? ORDER BY added",
+                (video_id, int(video))
+            ).fetchall()
+
+            for path, size, mtime, digest in rows:
+                if ext and os.path.splitext(path)[1].lstrip('.').lower() != ext.lower():
+                    continue
+                current = unsettled(path)  # Downloaded earlier this session, not moved out of the work directory yet
+                try:
+                    stat = os.stat(current)
+                except OSError:
+                    stat = None
+                # A file that changed since is only trusted if its content still is the same
+                intact = stat is not None and stat.st_size == size and (
+                    stat.st_mtime == mtime or (digest is not None and content_hash(current) == digest)
+                )
+                if intact:
+                    return current
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return None
+
+    def reuse(self, video_id: str, video: bool, stem: str, ext: str = None, fmt: str = None) -> Optional[str]:
+        """
+        Puts the library's file of the video at stem + its extension (as set by mode), returns the path or None
+        :param stem: The path the download would get, without its extension
+        :param ext: Only files with this extension, any if None
+        :param fmt: The format of the download, recorded for the new path (the one of the library's file if None)
+        """
+        source = self.find(video_id, video, ext)
+        if source is None:
+            return None
+        if self.mode == SKIP:
+            return source
+
+        target = stem + os.path.splitext(source)[1]
+        if os.path.exists(target) and os.path.samefile(source, target):
+            return target
+        if os.path.exists(target):
+            return None  # Something else has the name, downloading is the only way to be sure
+
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        place(source, target, self.mode)
+        if fmt is None:
+            with self._connection() as conn:
+                row = conn.execute("SELECT format FROM files WHERE path = ?", (settled(source),)).fetchone()
+            fmt = row[0] if row else None
+        self.add(video_id, video, target, fmt)
+        return target
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from .relocate import settled
+
+MANIFEST_FILE_NAME = '.manifest.json'
+
+
+class Manifest:
+
+    """
+    What a playlist folder already holds, entry id -> its file, so a sync only fetches what's new
+    Files are kept under the name they were downloaded with, index shifts don't rename anything
+    A playlist folder inside a work-around temp folder (see relocate.route) is read from where its files
+    are moved to, and saved into the temp folder, so the manifest is moved there with them
+    :param directory: The playlist folder
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.settled = settled(directory)
+        self.path = os.path.join(directory, MANIFEST_FILE_NAME)
+        self.playlist = {}  # id, title, url of the playlist, last_index its entries are padded for
+        self.entries = {}  # key -> {'id', 'title', 'index', 'file', 'format', 'time'}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(entry_id: str, video: bool) -> str:
+        # The audio and the video of an entry can live in the same folder
+        return f"{entry_id}:{'video' if video else 'audio'}"
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.settled, MANIFEST_FILE_NAME), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return  # No manifest yet (or a broken one), everything counts as new
+        self.playlist = data.get('playlist') or {}
+        self.entries = data.get('entries') or {}
+
+    def save(self) -> None:
+        with self._lock:
+            data = {'playlist': self.playlist, 'entries': self.entries}
+            tmp = self.path + '.tmp'
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def get(self, entry_id: str, video: bool) -> Optional[dict]:
+        return self.entries.get(self.key(entry_id, video))
+
+    def file(self, entry_id: str, video: bool) -> Optional[str]:
+        """The full path of the entry's file if the manifest has it and it still exists, else None"""
+        record = self.get(entry_id, video)
+        if not record or not record.get('file'):
+            return None
+        path = os.path.join(self.settled, record['file'])
+        return path if os.path.exists(path) else None
+
+    def add(self, entry_id: str, video: bool, path: str, title: str = None, index: int = None,
+            fmt: str = None) -> None:
+        """
+        Records the file of an entry
+        :param path: The file, in the playlist folder or where it is moved to
+        :param fmt: The format spec it was downloaded with
+        """
+        with self._lock:
+            self.entries[self.key(entry_id, video)] = {
+                'id': entry_id,
+                'title': title,
+                'index': index,
+                'file': os.path.relpath(settled(path), self.settled),
+                'format': fmt,
+                'time': time.time()
+            }
+
+    def update(self, entry_id: str, video: bool, title: str = None, index: int = None, path: str = None) -> None:
+        """Keeps the title/index of an entry current, its file only changes if path (it was renamed) is given"""
+        with self._lock:
+            record = self.entries.get(self.key(entry_id, video))
+            if record is not None:
+                record['title'], record['index'] = title, index
+                if path is not None:
+                    record['file'] = os.path.relpath(settled(path), self.settled)
+
+    def prune(self, keep_ids: set, video: bool) -> list[str]:
+        """
+        Deletes the files of the entries that are no longer in the playlist
+        :param keep_ids: The ids the playlist still has
+        :param video: Only the entries of this mode are pruned
+        :return: The deleted files
+        """
+        deleted = []
+        with self._lock:
+            for key, record in list(self.entries.items()):
+                if record['id'] in keep_ids or key != self.key(record['id'], video):
+                    continue
+                path = os.path.join(self.settled, record['file'])
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue  # Kept in the manifest, the next sync tries again
+                del self.entries[key]
+                deleted.append(path)
+        return deleted
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from . import metrics
+from .scheduler import SCHEDULER
+from .transcode import FFMPEG
+
+# Containers that take the video and audio codecs (prefixes) as they are, the first match wins, mkv takes anything
+CONTAINERS = (
+    ('mp4', ('avc1', 'h264', 'hev1', 'hvc1', 'av01'), ('mp4a', 'aac', 'ac-3', 'ec-3')),
+    ('webm', ('vp8', 'vp9', 'vp09', 'av01'), ('opus', 'vorbis')),
+)
+FALLBACK_CONTAINER = 'mkv'
+STREAM_WORKERS = 4  # Audio streams fetched next to the video streams (which are fetched by the caller's thread)
+
+_streams = None
+_streams_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Long-lived, so the YoutubeDL of every worker thread is reused
+    global _streams
+    with _streams_lock:
+        if _streams is None:
+            _streams = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="Stream")
+        return _streams
+
+
+def container(video: dict, audio: dict) -> str:
+    """The container the two formats are remuxed into without a re-encode"""
+    vcodec = (video.get('vcodec') or '').lower()
+    acodec = (audio.get('acodec') or '').lower()
+    for ext, vcodecs, acodecs in CONTAINERS:
+        if vcodec.startswith(vcodecs) and acodec.startswith(acodecs):
+            return ext
+    return FALLBACK_CONTAINER
+
+
+def part_name(path: str, fmt: dict) -> str:
+    """The intermediate file of one stream, the same .fNNN name yt_dlp gives it"""
+    return f"{os.path.splitext(path)[0]}.f{fmt['format_id']}.{fmt.get('ext') or 'unknown_video'}"
+
+
+def remux(video: str, audio: str, output: str) -> None:
+    """Copies the video stream of one file and the audio stream of the other into output, nothing is re-encoded"""
+    tmp = f"{os.path.splitext(output)[0]}.temp{os.path.splitext(output)[1]}"
+    command = [
+        FFMPEG, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', '-i', video, '-i', audio,
+        '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', tmp
+    ]
+    with tempfile.TemporaryFile() as stderr:
+        code = subprocess.call(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=stderr)
+        if code != 0:
+            stderr.seek(0)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise RuntimeError(f"ffmpeg exited with {code}: {stderr.read().decode(errors='replace').strip()}")
+    os.replace(tmp, output)
+
+
+def fetch_and_merge(url: str, info: dict, formats: list[dict], path: str, options: dict, priority: int) -> str:
+    """
+    Downloads the audio and the video stream at the same time, then remuxes them into path, returns path
+    The .fNNN files are removed as soon as the merged file exists, an interrupted run resumes them
+    :param formats: [audio, video] as formats.select gives them
+    :param path: The final file, its extension should come from container()
+    :param options: The yt_dlp options of the download (progress hooks, rate limit, chunk size...)
+    :param priority: Scheduler priority of the transfers
+    """
+    from .segmented import fetch  # Imports yt_dlp
+
+    audio, video = formats
+    parts = [part_name(path, video), part_name(path, audio)]
+
+    # Both streams come from the same host: the audio keeps one of the connections per_host allows,
+    # otherwise the segmented video takes all of them and the audio only starts once the video is done
+    video_connections = max(1, min(SCHEDULER.connections, SCHEDULER.per_host) - 1)
+    pending = _executor().submit(fetch, info, audio, parts[1], options, priority, 1)
+    try:
+        fetch(info, video, parts[0], options, priority, video_connections)
+    finally:
+        # Waited for either way, a failed stream keeps the other one's .part for the next run
+        wait([pending])
+    pending.result()
+
+    with metrics.stage(url, metrics.MERGE, container=os.path.splitext(path)[1].lstrip('.')):
+        remux(*parts, path)
+    for part in parts:
+        os.remove(part)
+    return path
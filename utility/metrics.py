@@ -0,0 +1,172 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+EXTRACT = 'extract'
+SELECT = 'select'
+TRANSFER = 'transfer'
+MERGE = 'merge'
+TRANSCODE = 'transcode'
+POSTPROCESS = 'postprocess'
+TIMESTAMP = 'timestamp'
+RELOCATE = 'relocate'
+WORKAROUND = 'workaround'
+DOWNLOAD = 'download'  # The whole item, from the first request to the final file
+
+SINK: 'Recorder' = None  # Where the timings go, None records nothing. Set by the caller
+
+
+class Recorder:
+
+    """
+    Collects per-stage timings of every item
+    :param path: A .prom file is rewritten as a Prometheus text file (node_exporter textfile collector),
+                 anything else gets one JSON line per record appended
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.prometheus = path.endswith('.prom')
+        self.totals = {}  # stage -> {'count', 'errors', 'seconds', 'bytes'}
+        self._lock = threading.Lock()
+
+    def record(self, item: str, stage: str, seconds: float, **fields) -> dict:
+        """
+        Records one finished stage of an item
+        :param item: The url (or path) the stage worked on
+        :param stage: EXTRACT, SELECT, TRANSFER...
+        :param seconds: How long the stage took
+        :param fields: bytes, speed, error, format...
+        """
+        record = dict(fields, item=item, stage=stage, seconds=round(seconds, 6), time=time.time())
+
+        with self._lock:
+            total = self.totals.setdefault(stage, {'count': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0})
+            total['count'] += 1
+            total['errors'] += fields.get('error') is not None
+            total['seconds'] += seconds
+            total['bytes'] += fields.get('bytes') or 0
+
+            os.makedirs(os.path.split(self.path)[0] or '.', exist_ok=True)
+            if self.prometheus:
+                self._write_prometheus()
+            else:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        return record
+
+    def _write_prometheus(self) -> None:
+        lines = []
+        for name, key, kind, text in (
+                ('ytd_stage_total', 'count', 'counter', "Finished stages"),
+                ('ytd_stage_errors_total', 'errors', 'counter', "Failed stages"),
+                ('ytd_stage_seconds_total', 'seconds', 'counter', "Seconds spent in the stage"),
+                ('ytd_stage_bytes_total', 'bytes', 'counter', "Bytes handled by the stage")
+        ):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for stage, total in sorted(self.totals.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {total[key]}')
+
+        # Written aside and renamed, so a scrape never sees half a file
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.path)
+
+
+def record(item: str, stage: str, seconds: float, **fields) -> None:
+    if SINK is not None:
+        SINK.record(item, stage, seconds, **fields)
+
+
+@contextmanager
+def stage(item: str, name: str, **fields):
+    """
+    Times the block as one stage of item, an exception is recorded as its error (and re-raised)
+    Yields the fields, so the block can add bytes, error... to them
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields.setdefault('error', repr(e))
+        raise
+    finally:
+        record(item, name, time.perf_counter() - start, **fields)
+
+
+def timed(name: str, item=None):
+    """
+    Decorator version of stage
+    :param name: The stage
+    :param item: Gives the item from the arguments, by default the url of the instance (if a method)
+    """
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if SINK is None:
+                return func(*args, **kwargs)
+            key = item(*args, **kwargs) if item else getattr(args[0], 'url', None) if args else None
+            with stage(key, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Hooks:
+
+    """
+    progress_hooks and postprocessor_hooks of one item, turn yt_dlp's status dicts into stages
+    :param item: The url of the item
+    """
+
+    __slots__ = (
+        'item',
+        '_started'
+    )
+
+    def __init__(self, item: str) -> None:
+        self.item = item
+        self._started = {}  # postprocessor -> when it started
+
+    def progress(self, d: dict) -> None:
+        status = d.get('status')
+        if status not in ('finished', 'error'):
+            return
+
+        size = d.get('total_bytes') or d.get('downloaded_bytes')
+        elapsed = d.get('elapsed') or 0.0
+        record(
+            self.item, TRANSFER, elapsed,
+            file=d.get('filename'),
+            bytes=size,
+            speed=(size / elapsed) if size and elapsed else None,
+            format=(d.get('info_dict') or {}).get('format_id'),
+            error=None if status == 'finished' else "Transfer failed"
+        )
+
+    def postprocess(self, d: dict) -> None:
+        name = d.get('postprocessor')
+        if d.get('status') == 'started':
+            self._started[name] = time.perf_counter()
+        elif d.get('status') == 'finished' and name in self._started:
+            record(
+                self.item, MERGE if name == 'Merger' else POSTPROCESS,
+                time.perf_counter() - self._started.pop(name),
+                postprocessor=name
+            )
+
+    def add_to(self, options: dict) -> dict:
+        """Adds the hooks to a copy of the yt_dlp options"""
+        return dict(
+            options,
+            progress_hooks=list(options.get('progress_hooks') or []) + [self.progress],
+            postprocessor_hooks=list(options.get('postprocessor_hooks') or []) + [self.postprocess]
+        )
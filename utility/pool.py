@@ -0,0 +1,157 @@
+import atexit
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+
+# Options a YoutubeDL only applies in its __init__, a borrow asking for them gets a fresh instance
+UNPOOLABLE = (
+    'postprocessors',
+    'post_hooks',
+    'logger',
+    'logtostderr',
+    'cookiefile',
+    'cookiesfrombrowser',
+    'proxy',
+    'source_address',
+    'http_headers',
+    'restrictfilenames',
+)
+
+BASE_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+}
+
+
+class PooledYoutubeDL:
+
+    """
+    A long-lived YoutubeDL (HTTP connections, cookies and extractor instances are kept),
+    reconfigured for every borrow. Only ever used by the thread that created it
+    """
+
+    def __init__(self) -> None:
+        import yt_dlp
+
+        self.progress_hooks = []
+        self.postprocessor_hooks = []
+        self.in_use = False
+        self.ydl = yt_dlp.YoutubeDL(dict(
+            BASE_OPTIONS,
+            progress_hooks=[self._progress],
+            postprocessor_hooks=[self._postprocess]
+        ))
+        self._baseline = dict(self.ydl.params)
+        self._baseline_outtmpl = dict(self.ydl.params['outtmpl'])
+
+    def _progress(self, d: dict) -> None:
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def _postprocess(self, d: dict) -> None:
+        for hook in self.postprocessor_hooks:
+            hook(d)
+
+    def configure(self, options: dict):
+        """Applies the options of a borrow on top of the baseline params, returns the YoutubeDL"""
+        ydl = self.ydl
+        params = ydl.params
+        self.in_use = True
+
+        # The same dict object, extractors and downloaders hold a reference to it
+        params.clear()
+        params.update(self._baseline)
+        params.update({k: v for k, v in options.items() if k not in ('progress_hooks', 'postprocessor_hooks')})
+
+        outtmpl = options.get('outtmpl')
+        params['outtmpl'] = dict(
+            self._baseline_outtmpl, **(outtmpl if isinstance(outtmpl, dict) else {'default': outtmpl} if outtmpl else {})
+        )
+
+        self.progress_hooks = list(options.get('progress_hooks') or [])
+        self.postprocessor_hooks = list(options.get('postprocessor_hooks') or [])
+
+        fmt = params.get('format')
+        ydl.format_selector = fmt if fmt in (None, '-') or callable(fmt) else ydl.build_format_selector(fmt)
+
+        archive = params.get('download_archive')
+        if archive is None:
+            ydl.archive = set()
+        elif isinstance(archive, (str, os.PathLike)):
+            try:
+                with open(archive, 'r', encoding='utf-8') as file:
+                    ydl.archive = {line.strip() for line in file}
+            except FileNotFoundError:
+                ydl.archive = set()
+        else:
+            ydl.archive = archive
+
+        return ydl
+
+    def release(self) -> None:
+        # Drops the references of the borrow, the connections stay open
+        self.progress_hooks = []
+        self.postprocessor_hooks = []
+        self.in_use = False
+
+    def close(self) -> None:
+        self.ydl.close()
+
+
+_local = threading.local()
+_all = set()  # The instances of the threads that are still alive
+_all_lock = threading.Lock()
+
+
+def _retire(pooled: PooledYoutubeDL) -> None:
+    with _all_lock:
+        if pooled not in _all:
+            return  # Already closed by close_all
+        _all.discard(pooled)
+    try:
+        pooled.close()
+    except Exception:
+        pass
+
+
+def _pooled() -> PooledYoutubeDL:
+    pooled = getattr(_local, 'ydl', None)
+    if pooled is None:
+        pooled = _local.ydl = PooledYoutubeDL()
+        with _all_lock:
+            _all.add(pooled)
+        # Closed once its thread is gone (e.g. the workers of a finished pool), nobody else may use it
+        weakref.finalize(threading.current_thread(), _retire, pooled)
+    return pooled
+
+
+@contextmanager
+def borrow(options: dict):
+    """
+    Yields a YoutubeDL configured with options, the one of the current thread if possible
+    :param options: The same options a yt_dlp.YoutubeDL would get
+    """
+    pooled = _pooled()
+
+    # A nested borrow (or options the pooled one can't take) gets its own instance
+    if pooled.in_use or any(key in options for key in UNPOOLABLE):
+        import yt_dlp
+
+        with yt_dlp.YoutubeDL(dict(BASE_OPTIONS, **options)) as ydl:
+            yield ydl
+        return
+
+    try:
+        yield pooled.configure(options)
+    finally:
+        pooled.release()
+
+
+@atexit.register
+def close_all() -> None:
+    """Closes every pooled YoutubeDL (saves cookies, closes connections)"""
+    with _all_lock:
+        pooled = list(_all)
+    for p in pooled:
+        _retire(p)
@@ -0,0 +1,98 @@
+import os
+import random
+from functools import lru_cache
+
+DIRECT = 'direct'  # Download straight into the directory
+SAME_FS_TEMP = 'same-fs-temp'  # Download into a temp directory on the same filesystem, then rename
+CROSS_FS_COPY = 'cross-fs-copy'  # Download into a temp directory elsewhere, then copy
+
+
+class Capabilities:
+
+    """
+    What the process is allowed to do in a directory and how downloads should get there
+    :param path: The probed directory
+    """
+
+    __slots__ = (
+        'path',
+        'create',
+        'rename',
+        'utime',
+        'strategy',
+        'temp_parent'
+    )
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.create = False
+        self.rename = False
+        self.utime = False
+        self.strategy = CROSS_FS_COPY
+        self.temp_parent = None  # Where the temp directory goes, None for DIRECT
+
+    def __repr__(self):
+        return (f"{self.path}: {self.strategy} "
+                f"(create={self.create}, rename={self.rename}, utime={self.utime}, temp={self.temp_parent})")
+
+
+def _check(path: str) -> tuple[bool, bool, bool]:
+    """Tries to create, rename and utime a file in path, returns what worked"""
+    create = rename = utime = False
+    name = os.path.join(path, f".yt_probe_{os.getpid()}_{random.randint(0, 100000000)}")
+    renamed = name + ".part"
+
+    try:
+        os.makedirs(path, exist_ok=True)
+        with open(name, 'wb') as file:
+            file.write(b'probe')
+        create = True
+
+        os.replace(name, renamed)
+        name, rename = renamed, True
+
+        os.utime(name, None)
+        utime = True
+    except OSError:
+        pass
+    finally:
+        for leftover in (name, renamed):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+
+    return create, rename, utime
+
+
+def _device(path: str):
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def probe(path: str, temp_parents: tuple = ()) -> Capabilities:
+    """
+    Probes a download directory once per path (the result is cached)
+    :param path: The download directory
+    :param temp_parents: Directories a temp directory may be created in, in order of preference
+    """
+    caps = Capabilities(path)
+    caps.create, caps.rename, caps.utime = _check(path)
+
+    # yt_dlp writes .part files and renames them, the timestamp is only cosmetic
+    if caps.create and caps.rename:
+        caps.strategy = DIRECT
+        return caps
+
+    usable = [p for p in temp_parents if all(_check(p)[:2])]
+    if not usable:
+        return caps
+
+    device = _device(path)
+    same_fs = [p for p in usable if device is not None and _device(p) == device]
+    caps.temp_parent = (same_fs or usable)[0]
+    caps.strategy = SAME_FS_TEMP if same_fs else CROSS_FS_COPY
+    return caps
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB per system call instead of dd's default 512 bytes
+RELOCATE_WORKERS = 4
+
+_routes = {}  # work directory -> destination its files are moved into
+_routes_lock = threading.Lock()
+
+
+def route(work_dir: str, destination: str) -> None:
+    """Files written into work_dir (a work-around temp folder) are moved into destination, sub folders and all"""
+    with _routes_lock:
+        _routes[os.path.abspath(work_dir)] = os.path.abspath(destination)
+
+
+def unroute(work_dir: str) -> None:
+    with _routes_lock:
+        _routes.pop(os.path.abspath(work_dir), None)
+
+
+def settled(path: str) -> str:
+    """Where path ends up once its work directory is moved into the destination, path itself if it isn't in one"""
+    path = os.path.abspath(path)
+    with _routes_lock:
+        for work_dir, destination in _routes.items():
+            if path == work_dir or path.startswith(work_dir + os.sep):
+                return os.path.normpath(os.path.join(destination, os.path.relpath(path, work_dir)))
+    return path
+
+
+def unsettled(path: str) -> str:
+    """Where a path settled() gave still is while its work directory isn't moved yet, path itself otherwise"""
+    path = os.path.abspath(path)
+    with _routes_lock:
+        for work_dir, destination in _routes.items():
+            if path == destination or path.startswith(destination + os.sep):
+                working = os.path.normpath(os.path.join(work_dir, os.path.relpath(path, destination)))
+                if os.path.exists(working):
+                    return working
+    return path
+
+
+def _checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, size: int) -> int:
+    """Copies in the kernel as far as it can, returns the offset it reached"""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < size:
+                n = os.copy_file_range(src_fd, dst_fd, min(CHUNK_SIZE, size - offset), offset, offset)
+                if n == 0:
+                    break
+                offset += n
+            return offset
+        except OSError:
+            pass  # e.g. EXDEV on old kernels or unsupported by the filesystem
+
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while offset < size:
+                n = os.sendfile(dst_fd, src_fd, offset, min(CHUNK_SIZE, size - offset))
+                if n == 0:
+                    break
+                offset += n
+        except OSError:
+            pass
+
+    return offset
+
+
+def copy(src: str, dst: str) -> None:
+    """Copies src to dst with large chunks, in the kernel if possible"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = _copy_range(fsrc.fileno(), fdst.fileno(), 0, size)
+
+        # Plain buffered copy of whatever the kernel didn't do
+        if offset < size:
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+            fdst.truncate()
+
+
+@metrics.timed(metrics.RELOCATE, item=lambda src, *args, **kwargs: src)
+def relocate(src: str, destination_dir: str, checksum: bool = True) -> str:
+    """
+    Moves a file into destination_dir, renaming if possible and copying + verifying otherwise
+    :param src: The file to move
+    :param destination_dir: The directory to move it to
+    :param checksum: Whether a copy is verified by sha256 too (the size is always verified)
+    :return: The new path of the file
+    :raise OSError: if the file couldn't be moved, src and any file already at the destination are left untouched then
+    """
+    dst = os.path.join(destination_dir, os.path.basename(src))
+
+    try:
+        os.replace(src, dst)
+        return dst
+    except OSError:
+        pass  # Another filesystem or a storage that doesn't allow renames
+
+    # Copied under a temporary name next to dst, a file already at dst is only replaced by a verified copy
+    tmp = os.path.join(destination_dir, f".{os.path.basename(src)}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        copy(src, tmp)
+        if os.path.getsize(src) != os.path.getsize(tmp):
+            raise OSError(f"Size mismatch after copying {src} to {dst}")
+        if checksum and _checksum(src) != _checksum(tmp):
+            raise OSError(f"Checksum mismatch after copying {src} to {dst}")
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    os.remove(src)
+    return dst
+
+
+def relocate_all(files: list[str], destination_dir: str, workers: int = RELOCATE_WORKERS, checksum: bool = True) -> dict:
+    """
+    Moves many files in parallel
+    :return: file -> new path, or the exception if it couldn't be moved
+    """
+    def one(file):
+        try:
+            return relocate(file, destination_dir, checksum)
+        except Exception as e:
+            return e
+
+    os.makedirs(destination_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="Relocate") as pool:
+        return dict(zip(files, pool.map(one, files)))
@@ -0,0 +1,157 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+HIGH = 0  # Single downloads asked for by the user
+BULK = 10  # Playlist entries
+
+FRAGMENT_PROTOCOLS = ('http_dash_segments', 'http_dash_segments_generator', 'm3u8', 'm3u8_native')
+CHUNK_SIZE = 10 * 1024 * 1024  # YouTube throttles progressive https formats that are fetched in one request
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url or '').hostname or '').lower()
+
+
+class Transfer:
+
+    """
+    An admitted transfer, add Transfer.hook to the progress_hooks of its YoutubeDL
+    :param scheduler: The scheduler that admitted it
+    :param host: The host the bytes come from
+    :param priority: HIGH or BULK (lower goes first)
+    :param connections: Connections it may open to the host, never more than its share of per_host
+    """
+
+    __slots__ = (
+        'scheduler',
+        'host',
+        'priority',
+        'connections',
+        'downloaded'
+    )
+
+    def __init__(self, scheduler: 'Scheduler', host: str, priority: int, connections: int = 1) -> None:
+        self.scheduler = scheduler
+        self.host = host
+        self.priority = priority
+        self.connections = connections
+        self.downloaded = {}  # filename -> bytes seen so far
+
+    def hook(self, d: dict) -> None:
+        """Progress hook that holds the download thread back when the global budget is used up"""
+        if d.get('status') != 'downloading' or d.get('downloaded_bytes') is None:
+            return
+
+        name = d.get('tmpfilename') or d.get('filename')
+        done = d['downloaded_bytes']
+        delta = done - self.downloaded.get(name, 0)
+        self.downloaded[name] = done
+        if delta > 0:
+            self.scheduler.consume(delta)
+
+
+class Scheduler:
+
+    """
+    Owns every active transfer: admits them by priority, caps connections per host
+    and shares one bytes-per-second budget between them
+    :param max_active: Transfers running at the same time
+    :param per_host: Connections open at the same time against one host, a transfer holds one or more
+    :param rate: Global budget in bytes per second, None for no limit
+    :param fragments: Fragments fetched concurrently for DASH/HLS formats
+    :param connections: Connections a large progressive (http/https) format is split over
+    """
+
+    def __init__(
+            self, max_active: int = 8, per_host: int = 4, rate: float = None, fragments: int = 4, connections: int = 4
+    ) -> None:
+        self.max_active = max_active
+        self.per_host = per_host
+        self.rate = rate
+        self.fragments = fragments
+        self.connections = connections
+
+        self.active = []
+        self._waiting = []  # (priority, seq, host)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self._bucket_lock = threading.Lock()
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+
+    def _host_count(self, host: str) -> int:
+        return sum(t.connections for t in self.active if t.host == host)
+
+    def _next(self):
+        """The waiter that goes next: best priority whose host still has room"""
+        if len(self.active) >= self.max_active:
+            return None
+        for waiter in sorted(self._waiting):
+            if self._host_count(waiter[2]) < self.per_host:
+                return waiter
+        return None
+
+    @contextmanager
+    def transfer(self, host: str, priority: int = BULK, connections: int = 1):
+        """
+        Blocks until the transfer may start, yields its Transfer
+        :param connections: Connections it would like to open, Transfer.connections says how many it got
+        (at least one, at most what per_host leaves to the host)
+        """
+        waiter = (priority, next(self._seq), host)
+        with self._cond:
+            self._waiting.append(waiter)
+            self._cond.wait_for(lambda: self._next() == waiter)
+            self._waiting.remove(waiter)
+            connections = max(1, min(connections, self.per_host - self._host_count(host)))
+            transfer = Transfer(self, host, priority, connections)
+            self.active.append(transfer)
+            self._cond.notify_all()
+
+        try:
+            yield transfer
+        finally:
+            with self._cond:
+                self.active.remove(transfer)
+                self._cond.notify_all()
+
+    def consume(self, amount: int) -> None:
+        """Takes amount bytes out of the token bucket, sleeps while it is in debt"""
+        if not self.rate:
+            return
+
+        with self._bucket_lock:
+            now = time.monotonic()
+            # At most one second worth of burst
+            self._tokens = min(self.rate, self._tokens + (now - self._refilled) * self.rate) - amount
+            self._refilled = now
+            debt = -self._tokens
+
+        if debt > 0:
+            time.sleep(debt / self.rate)
+
+    def tune(self, options: dict, formats: list[dict]) -> dict:
+        """Returns a copy of the yt_dlp options tuned for the chosen formats"""
+        options = dict(options)
+        protocols = {f.get('protocol') for f in formats}
+
+        if protocols & set(FRAGMENT_PROTOCOLS):
+            options['concurrent_fragment_downloads'] = self.fragments
+        if 'https' in protocols or 'http' in protocols:
+            options['http_chunk_size'] = CHUNK_SIZE
+        return options
+
+    def host(self, formats: list[dict], fallback_url: str = None) -> str:
+        """The host the transfer of the formats is counted against"""
+        for fmt in formats:
+            if fmt.get('url'):
+                return host_of(fmt['url'])
+        return host_of(fallback_url)
+
+
+# Shared by every download of the process
+SCHEDULER = Scheduler()
@@ -1,17 +1,25 @@
 from random import choice
-from re import compile as rcomp
 
-from youtube_search import YoutubeSearch
+from .urls import classify
 
 
 def is_url(string):
-    regex = rcomp(r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/(watch\?v=|embed/|shorts/)|youtu\.be\/)([a-zA-Z0-9_-]+)')
-    return bool(regex.match(string))
+    """Whether the string is the url of a video (a playlist url with a v= counts too)"""
+    return classify(string).video_id is not None
 
 
 def is_playlist(url):
-    regex = rcomp(r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com|youtu\.be)\/.*(?:\?|&)list=([^&]+)')
-    return bool(regex.match(url))
+    return classify(url).playlist_id is not None
+
+
+def video_id(string):
+    """Returns the id of the video from the url or None"""
+    return classify(string).video_id
+
+
+def playlist_id(url):
+    """Returns the id of the playlist from the url or None"""
+    return classify(url).playlist_id
 
 
 class Query:
@@ -24,10 +32,12 @@ class Query:
         'thumbnail',
         'uploader',
         'duration',
-        'views'
+        'views',
+        'keyword'
     )
 
-    def __init__(self, cont: dict) -> None:
+    def __init__(self, cont: dict, keyword: str = None) -> None:
+        self.keyword = keyword  # The keyword that found this video (if searched)
         self.__set(cont)
 
     def __set(self, item):
@@ -65,8 +75,49 @@ class Search:
         self.__search()
 
     def __search(self):
+        from youtube_search import YoutubeSearch  # pulls in requests, only needed once searching
+
         results = YoutubeSearch(self.keyword, self.amount).to_dict()
-        self.queries = [Query(k) for k in results]
+        self.queries = [Query(k, self.keyword) for k in results]
+
+
+async def search_many(keywords, amount: int = 10, limit: int = 8, unique: bool = True):
+    """
+    Searches many keywords concurrently and yields the Query objects as they arrive
+    Keywords that fail are skipped
+    :param keywords: The keywords to search for
+    :param amount: Number of results per keyword
+    :param limit: How many searches run at the same time
+    :param unique: Whether videos found by more than one keyword are only yielded once
+    """
+    import asyncio
+    from youtube_search import YoutubeSearch
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def one(keyword: str) -> list[Query]:
+        async with semaphore:
+            results = await asyncio.to_thread(lambda: YoutubeSearch(keyword, amount).to_dict())
+        return [Query(k, keyword) for k in results]
+
+    # dict.fromkeys drops duplicated keywords but keeps the order
+    tasks = [asyncio.ensure_future(one(k)) for k in dict.fromkeys(keywords) if k and not is_url(k)]
+    seen = set()
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                queries = await task
+            except Exception:
+                continue
+
+            for q in queries:
+                if unique and q.id in seen:
+                    continue
+                seen.add(q.id)
+                yield q
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 class SearchWithUrl:
@@ -85,11 +136,6 @@ class SearchWithUrl:
         self.__get(url)
 
     def __get(self, url):
-        import yt_dlp
-        ydl_opts = {
-            'quiet': True,
-            'skip_download': True
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=False)
-            self.video = Query(info_dict)
+        # the info dict is kept for the session, so downloading this url won't extract it again
+        from .info import get_info
+        self.video = Query(get_info(url))
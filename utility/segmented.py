@@ -0,0 +1,251 @@
+"""
+Downloads a progressive (http/https) format over several connections at once, each one fetching
+its own byte ranges into a preallocated .part file. Imports yt_dlp, only import it to download something.
+"""
+import errno
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+
+from .pool import borrow
+from .scheduler import SCHEDULER
+
+SEGMENT_SIZE = 4 * 1024 * 1024  # Below the size YouTube starts throttling a single range at
+MIN_SIZE = 2 * SEGMENT_SIZE  # Smaller formats go over one connection
+READ_SIZE = 64 * 1024
+RETRIES = 3  # Per segment, a retry continues where the segment stopped
+SEGMENT_WORKERS = 16  # Connections of every segmented download of the process together
+REPORT_INTERVAL = 0.5  # Seconds between progress reports
+
+_segments = None
+_segments_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Long-lived, the YoutubeDL (and its kept-alive connection) of every worker thread is reused
+    global _segments
+    with _segments_lock:
+        if _segments is None:
+            _segments = ThreadPoolExecutor(max_workers=SEGMENT_WORKERS, thread_name_prefix="Segment")
+        return _segments
+
+
+if hasattr(os, 'pwrite'):
+    def _pwrite(fd: int, data: bytes, offset: int, lock: threading.Lock) -> None:
+        os.pwrite(fd, data, offset)
+else:
+    def _pwrite(fd: int, data: bytes, offset: int, lock: threading.Lock) -> None:
+        # No positional writes (Windows), seek and write may not interleave
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """
+    Reserves the blocks of the whole file up front (one extent, no fragmentation), falls back to a sparse file
+    :raise OSError: ENOSPC if the disk is too full, before a single byte is fetched
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            return os.posix_fallocate(fd, 0, size)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            # Not supported by the filesystem
+    os.ftruncate(fd, size)
+
+
+def suitable(fmt: dict) -> bool:
+    """
+    Whether the format is worth splitting: progressive and big enough
+    With a single connection it is still fetched in segments, into a preallocated file
+    """
+    return (
+        fmt.get('protocol', 'https') in ('http', 'https')
+        and (fmt.get('filesize') or fmt.get('filesize_approx') or 0) >= MIN_SIZE
+    )
+
+
+class SegmentedFD(HttpFD):
+
+    """
+    yt_dlp downloader for progressive formats, fetches SEGMENT_SIZE ranges over SegmentedFD.connections connections
+    and writes each one at its offset. Finished segments are recorded next to the .part file,
+    an interrupted download only fetches the ones that are missing. Servers without ranges get the plain HttpFD
+    """
+
+    connections = 1  # Set to the connections its transfer was given, they count against the per-host cap
+
+    def _probe(self, url: str, headers: dict):
+        """The size of the file, None if the server doesn't do ranges"""
+        with borrow({}) as ydl:
+            response = ydl.urlopen(Request(url, headers=dict(headers, Range='bytes=0-0')))
+            try:
+                content_range = response.headers.get('Content-Range') or ''
+                if response.status != 206 or '/' not in content_range or content_range.endswith('*'):
+                    return None
+                return int(content_range.rsplit('/', 1)[1])
+            finally:
+                response.close()
+
+    @staticmethod
+    def _segment(url: str, headers: dict, fd: int, lock: threading.Lock, start: int, end: int, progress) -> int:
+        """Fetches bytes start-end (inclusive) into fd, on a worker thread"""
+        offset = start
+        for attempt in range(RETRIES + 1):
+            try:
+                with borrow({}) as ydl:
+                    response = ydl.urlopen(Request(url, headers=dict(headers, Range=f"bytes={offset}-{end}")))
+                    try:
+                        if response.status != 206:
+                            raise OSError(f"Expected a partial response, got {response.status}")
+                        for block in iter(lambda: response.read(READ_SIZE), b''):
+                            block = block[:end + 1 - offset]
+                            _pwrite(fd, block, offset, lock)
+                            offset += len(block)
+                            progress(len(block))
+                            # Holds this connection back while the global budget is used up
+                            SCHEDULER.consume(len(block))
+                            if offset > end:
+                                break
+                    finally:
+                        response.close()
+                if offset > end:
+                    return end + 1 - start
+                raise OSError(f"Segment {start}-{end} ended at {offset}")
+            except Exception:
+                if attempt == RETRIES:
+                    raise
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = info_dict.get('http_headers') or {}
+        total = info_dict.get('filesize') or self._probe(url, headers)
+        if not total or total < MIN_SIZE:
+            return super().real_download(filename, info_dict)
+
+        tmp = self.temp_name(filename)
+        state_path = tmp + '.segments'
+        segments = [(start, min(start + SEGMENT_SIZE, total) - 1) for start in range(0, total, SEGMENT_SIZE)]
+
+        done = set()
+        try:
+            with open(state_path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            if state.get('total') == total and state.get('segment_size') == SEGMENT_SIZE and os.path.isfile(tmp):
+                done = set(state.get('done') or ())
+        except (OSError, ValueError):
+            pass
+
+        def save_state() -> None:
+            with open(state_path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump({'total': total, 'segment_size': SEGMENT_SIZE, 'done': sorted(done)}, file)
+            os.replace(state_path + '.tmp', state_path)
+
+        lock = threading.Lock()
+        downloaded = resumed = sum(segments[i][1] + 1 - segments[i][0] for i in done if i < len(segments))
+        if resumed:
+            self.report_resuming_byte(resumed)
+        else:
+            self.report_destination(filename)
+
+        def progress(amount: int) -> None:
+            nonlocal downloaded
+            with lock:
+                downloaded += amount
+
+        start_time = time.time()
+
+        def report(status: str = 'downloading') -> None:
+            elapsed = time.time() - start_time
+            speed = (downloaded - resumed) / elapsed if elapsed else None
+            self._hook_progress({
+                'status': status,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'tmpfilename': tmp,
+                'filename': filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and status == 'downloading' else None
+            }, info_dict)
+
+        # 0o666 like open() (os.open defaults to 0o777), the umask decides the rest
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            if not done:
+                _preallocate(fd, total)
+            # Right away, the space held for the download is freed up as soon as the file takes its blocks
+            report()
+
+            pending = [i for i in range(len(segments)) if i not in done]
+            in_flight = {}
+            executor = _executor()
+            try:
+                while pending or in_flight:
+                    while pending and len(in_flight) < self.connections:
+                        i = pending.pop(0)
+                        future = executor.submit(self._segment, url, headers, fd, lock, *segments[i], progress)
+                        in_flight[future] = i
+                    finished, _ = wait(in_flight, timeout=REPORT_INTERVAL, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        i = in_flight.pop(future)
+                        future.result()
+                        done.add(i)
+                    if finished:
+                        save_state()
+                    report()
+            except BaseException:
+                # Segments already running finish (or fail) on their own, their bytes only count once recorded
+                for future in in_flight:
+                    future.cancel()
+                wait(in_flight)
+                for future, i in in_flight.items():
+                    if not future.cancelled() and future.exception() is None:
+                        done.add(i)
+                save_state()
+                report('error')
+                raise
+        finally:
+            os.close(fd)
+
+        os.remove(state_path)
+        self.try_rename(tmp, filename)
+        report('finished')
+        return True
+
+
+def fetch(info: dict, fmt: dict, path: str, options: dict, priority: int, connections: int = None) -> str:
+    """
+    Downloads one format of the video to path, split over several connections if it is worth it
+    :param options: The yt_dlp options of the download (progress hooks, rate limit, chunk size...)
+    :param priority: Scheduler priority of the transfer
+    :param connections: Connections it is split over at most, SCHEDULER.connections if None
+    """
+    segmented = suitable(fmt)
+    wanted = (connections or SCHEDULER.connections) if segmented else 1
+    with SCHEDULER.transfer(SCHEDULER.host([fmt]), priority, wanted) as transfer:
+        if not segmented:
+            # The segments take from the global budget themselves
+            options = dict(options, progress_hooks=list(options.get('progress_hooks') or []) + [transfer.hook])
+        with borrow(options) as ydl:
+            # The fields of the format on top of the video's, like yt_dlp does for every requested format
+            stream = dict(info, **fmt)
+            stream.pop('requested_formats', None)
+            if segmented:
+                downloader = SegmentedFD(ydl, ydl.params)
+                downloader.connections = transfer.connections
+                for hook in options.get('progress_hooks') or ():
+                    downloader.add_progress_hook(hook)
+                success, _ = downloader.download(path, stream)
+            else:
+                success, _ = ydl.dl(path, stream)
+    if not success:
+        raise RuntimeError(f"Unable to download format {fmt['format_id']}")
+    return path
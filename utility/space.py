@@ -0,0 +1,145 @@
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from .formats import size
+from .relocate import settled
+
+MARGIN = 64 * 1024 * 1024  # Left free on every filesystem, for the metadata, the journal and everything else
+HOLD_TIMEOUT = 30 * 60  # Seconds a download waits for running ones to free up space before it is rejected
+
+
+class NotEnoughSpace(OSError):
+
+    """A download that doesn't fit on the disk it is written to, not even after the running ones finish"""
+
+
+def _existing(path: str) -> str:
+    """path or its nearest parent that exists, the directory of a download may not be made yet"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def _allocated(path: str) -> int:
+    """Bytes the blocks of the file take on the disk (all of them up front if it was preallocated), 0 if unknown"""
+    try:
+        return os.stat(path).st_blocks * 512
+    except (OSError, TypeError, AttributeError):
+        return 0  # No such file (yet), or no st_blocks (Windows)
+
+
+def estimate(formats: list[dict], duration: float = None) -> int:
+    """Bytes the formats will take, from filesize/filesize_approx (or bitrate x duration), 0 if unknown"""
+    return int(sum(size(f, duration) or 0 for f in formats))
+
+
+class Reservation:
+
+    """
+    Space held for one admitted download, add Reservation.hook to its progress_hooks
+    so what is on the disk stops counting twice (once there, once here), a preallocated file as soon as it is made
+    :param size: Bytes reserved on every filesystem of devices
+    :param devices: The st_dev of the filesystems the download is written to
+    """
+
+    __slots__ = (
+        'size',
+        'devices',
+        'written'
+    )
+
+    def __init__(self, size: int, devices: set) -> None:
+        self.size = size
+        self.devices = devices
+        self.written = {}  # final filename -> bytes on the disk so far
+
+    @property
+    def outstanding(self) -> int:
+        return max(0, self.size - sum(self.written.values()))
+
+    def hook(self, d: dict) -> None:
+        if d.get('status') in ('downloading', 'finished') and d.get('downloaded_bytes') is not None:
+            on_disk = _allocated(d.get('tmpfilename') if d['status'] == 'downloading' else d.get('filename'))
+            # Keyed by the final name, yt_dlp reports 'finished' without the .part name it reported before
+            self.written[d.get('filename') or d.get('tmpfilename')] = max(d['downloaded_bytes'], on_disk)
+
+
+class Admission:
+
+    """
+    Admits a download only if its formats fit on the filesystem(s) it is written to, next to the space
+    the downloads already running still need. One that doesn't fit yet is held until enough space is
+    freed up, one that can never fit is rejected right away, before anything is written
+    """
+
+    def __init__(self) -> None:
+        self.reservations = []
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def directories(directory: str) -> list[str]:
+        """directory and the one its files are moved into (see relocate.route), if any"""
+        directory = os.path.abspath(directory)
+        destination = settled(directory)
+        return [directory] if destination == directory else [directory, destination]
+
+    def _reserved(self, device: int) -> int:
+        return sum(r.outstanding for r in self.reservations if device in r.devices)
+
+    def _shortfall(self, need: int, devices: dict) -> tuple[int, int, str]:
+        """
+        (bytes missing now, bytes missing even if the running downloads needed nothing more, the directory)
+        of the filesystem that is the shortest
+        """
+        worst = (0, 0, None)
+        for device, path in devices.items():
+            free = shutil.disk_usage(path).free - MARGIN
+            shortfall = (need - (free - self._reserved(device)), need - free, path)
+            worst = max(worst, shortfall, key=lambda s: s[0])
+        return worst
+
+    @contextmanager
+    def admit(self, need: int, directories: list[str], timeout: float = HOLD_TIMEOUT):
+        """
+        Blocks until need bytes fit into every one of directories, yields the Reservation
+        :raise NotEnoughSpace: if they never can, or not within timeout
+        """
+        if need <= 0:
+            # Unknown size, nothing to hold it back for
+            yield Reservation(0, set())
+            return
+
+        devices = {}
+        for directory in directories:
+            path = _existing(directory)
+            devices.setdefault(os.stat(path).st_dev, path)
+
+        reservation = Reservation(need, set(devices))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now, later, path = self._shortfall(need, devices)
+                if now <= 0:
+                    break
+                if later > 0 or not self.reservations or time.monotonic() >= deadline:
+                    raise NotEnoughSpace(
+                        f"{need / 1024 ** 2:.1f} MiB don't fit into {path}, {now / 1024 ** 2:.1f} MiB short"
+                    )
+                # The running downloads may need less than estimated, fail, or have their files moved away
+                self._cond.wait(min(5.0, max(0.0, deadline - time.monotonic())))
+            self.reservations.append(reservation)
+
+        try:
+            yield reservation
+        finally:
+            with self._cond:
+                self.reservations.remove(reservation)
+                self._cond.notify_all()
+
+
+# Shared by every download of the process
+ADMISSION = Admission()
@@ -1,5 +1,23 @@
-import multiprocessing
-import time
+import threading
+
+FRAMES = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
+
+
+def _size(num) -> str:
+    if num is None:
+        return "?"
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(num) < 1024:
+            return f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}TiB"
+
+
+def _eta(seconds) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
 
 
 class Spinner:
@@ -7,38 +25,114 @@ class Spinner:
     def __init__(self, msg: str = "", speed: float = 0.1) -> None:
         self.msg = msg
         self.speed = speed
-        self.process = None  # Start with no process
+        self.thread = None  # Start with no thread
+        self._stop = threading.Event()
 
     def spin(self):
-        spinner = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
         n = 0
-        while True:
-            print(f'\r{spinner[n]} {f"[{self.msg}]" if self.msg else ""}', end="")
+        while not self._stop.is_set():
+            print(f'\r{FRAMES[n]} {f"[{self.msg}]" if self.msg else ""}', end="", flush=True)
             n += 1
-            if n >= len(spinner):
+            if n >= len(FRAMES):
                 n = 0
-            time.sleep(self.speed)
+            self._stop.wait(self.speed)
 
     @property
     def is_running(self) -> bool:
-        return self.process.is_alive() if self.process else False
+        return self.thread.is_alive() if self.thread else False
 
     def start(self):
-        if self.process and self.process.is_alive():
-            self.process.terminate()
+        if self.is_running:
+            self.stop()
 
-        # Reinitialize the process each time you start
-        self.process = multiprocessing.Process(
-            target=self.spin,
-            args=(),
-            name="Spinner"
-        )
-        self.process.start()
+        # A daemon thread is enough to animate a glyph, nothing gets spawned or imported again
+        self._stop.clear()
+        self.thread = threading.Thread(target=self.spin, name="Spinner", daemon=True)
+        self.thread.start()
 
     def stop(self):
-        if self.process and self.process.is_alive():
+        if self.is_running:
+            self._stop.set()
+            self.thread.join()
             print()  # Prints
-            self.process.kill()  # Terminate the process
-            self.process = None  # Reset the process object
+            self.thread = None  # Reset the thread object
         else:
             print("Warning: Spinner is not running!")
+
+
+class Progress:
+
+    """
+    Renders the progress of any number of downloads, feed it through yt_dlp's progress_hooks
+    :param speed: Seconds between two renders
+    """
+
+    def __init__(self, speed: float = 0.2) -> None:
+        self.speed = speed
+        self.thread = None
+        self.downloads = {}  # filename -> last status dict of yt_dlp
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def hook(self, d: dict) -> None:
+        """The progress hook, safe to be called from many download threads"""
+        with self._lock:
+            self.downloads[d.get('filename') or d.get('tmpfilename')] = d
+
+    @staticmethod
+    def line(d: dict, frame: str) -> str:
+        name = ((d.get('info_dict') or {}).get('title') or d.get('filename') or "")[:40]
+        done = d.get('downloaded_bytes')
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+
+        if d.get('status') == 'finished':
+            return f"[+] {name} {_size(total or done)} downloaded"
+        if d.get('status') == 'error':
+            return f"[-] {name} failed"
+
+        percent = f"{done / total * 100:5.1f}%" if done is not None and total else "  ?.?%"
+        speed = f"{_size(d.get('speed'))}/s" if d.get('speed') else "?/s"
+        return f"{frame} {name} {percent} {_size(done)}/{_size(total)} {speed} ETA {_eta(d.get('eta'))}"
+
+    def render(self, frame: str) -> None:
+        with self._lock:
+            # Finished downloads are printed once above the live lines and dropped
+            done = [n for n, d in self.downloads.items() if d.get('status') in ('finished', 'error')]
+            finished = [self.line(self.downloads.pop(n), frame) for n in done]
+            active = [self.line(d, frame) for d in self.downloads.values()]
+
+        out = f"\x1b[{self._lines}F" if self._lines else ""
+        out += "".join(f"\x1b[2K{line}\n" for line in finished + active)
+        # Clears the leftovers of a previous (longer) render
+        leftover = max(0, self._lines - len(finished) - len(active))
+        out += "\x1b[2K\n" * leftover
+        print(out, end="", flush=True)
+        self._lines = len(active) + leftover
+
+    def run(self):
+        n = 0
+        while not self._stop.is_set():
+            self.render(FRAMES[n])
+            n = (n + 1) % len(FRAMES)
+            self._stop.wait(self.speed)
+        self.render(FRAMES[n])
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread.is_alive() if self.thread else False
+
+    def start(self):
+        if self.is_running:
+            return
+
+        self._lines = 0
+        self._stop.clear()
+        self.thread = threading.Thread(target=self.run, name="Progress", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.is_running:
+            self._stop.set()
+            self.thread.join()
+            self.thread = None
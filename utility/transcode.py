@@ -0,0 +1,212 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from .pool import borrow
+from .scheduler import BULK, CHUNK_SIZE, SCHEDULER
+
+FFMPEG = 'ffmpeg'  # Name or path of the ffmpeg binary
+TRANSCODE_WORKERS = 2  # ffmpeg processes running at the same time
+READ_SIZE = 64 * 1024
+STREAMABLE = ('http', 'https')  # Protocols piped from here, anything else is read by ffmpeg itself
+LOUDNORM = 'loudnorm=I=-16:TP=-1.5:LRA=11'  # EBU R128, single pass
+
+# Extension -> (ffmpeg encoder, ffmpeg muxer, whether a bitrate applies)
+ENCODERS = {
+    'mp3': ('libmp3lame', 'mp3', True),
+    'm4a': ('aac', 'ipod', True),
+    'opus': ('libopus', 'opus', True),
+    'ogg': ('libvorbis', 'ogg', True),
+    'flac': ('flac', 'flac', False),
+    'wav': ('pcm_s16le', 'wav', False),
+}
+
+
+def available() -> bool:
+    """Whether the ffmpeg binary can be found"""
+    return shutil.which(FFMPEG) is not None
+
+
+class AudioTarget:
+
+    """
+    What the audio is transcoded to
+    :param ext: One of ENCODERS
+    :param bitrate: ffmpeg bitrate, e.g. 192k (ignored for lossless targets)
+    :param normalize: Whether the loudness is normalized (EBU R128)
+    :raise ValueError: if the extension is not supported
+    """
+
+    __slots__ = (
+        'ext',
+        'bitrate',
+        'normalize'
+    )
+
+    def __init__(self, ext: str = 'mp3', bitrate: str = '192k', normalize: bool = False) -> None:
+        if ext not in ENCODERS:
+            raise ValueError(f"Unsupported audio format {ext}, excepted one of {', '.join(ENCODERS)}")
+
+        self.ext = ext
+        self.bitrate = bitrate
+        self.normalize = normalize
+
+    def command(self, source: str, output: str, title: str = None, headers: dict = None) -> list[str]:
+        """The ffmpeg command reading source ('pipe:0' or an url) and writing output"""
+        encoder, muxer, lossy = ENCODERS[self.ext]
+
+        command = [FFMPEG, '-hide_banner', '-loglevel', 'error', '-y']
+        if source != 'pipe:0':
+            command.append('-nostdin')
+        if headers:
+            command += ['-headers', ''.join(f"{k}: {v}\r\n" for k, v in headers.items())]
+        command += ['-i', source, '-vn', '-c:a', encoder]
+        if lossy and self.bitrate:
+            command += ['-b:a', self.bitrate]
+        if self.normalize:
+            command += ['-af', LOUDNORM]
+        if title:
+            command += ['-metadata', f"title={title}"]
+        return command + ['-f', muxer, output]
+
+    def __repr__(self):
+        return f"{self.ext} {self.bitrate}{' normalized' if self.normalize else ''}"
+
+
+def _progress(hooks, status: str, **d) -> None:
+    d['status'] = status
+    for hook in hooks:
+        hook(d)
+
+
+def _pipe(fmt: dict, sink, hooks, d: dict) -> None:
+    """Streams the format into sink in ranged chunks, reports yt_dlp-like progress dicts to hooks"""
+    from yt_dlp.networking import Request
+
+    headers = fmt.get('http_headers') or {}
+    total = fmt.get('filesize')
+    done = 0
+    start = time.time()
+
+    with borrow({}) as ydl:
+        while total is None or done < total:
+            end = done + CHUNK_SIZE - 1
+            if total:
+                end = min(end, total - 1)
+
+            # Ranged like yt_dlp's http_chunk_size, YouTube throttles a single long response
+            response = ydl.urlopen(Request(fmt['url'], headers=dict(headers, Range=f"bytes={done}-{end}")))
+            try:
+                ranged = response.status == 206
+                content_range = response.headers.get('Content-Range') or ''
+                if ranged and '/' in content_range and not content_range.endswith('*'):
+                    total = int(content_range.rsplit('/', 1)[1])
+
+                got = 0
+                for block in iter(lambda: response.read(READ_SIZE), b''):
+                    sink.write(block)
+                    got += len(block)
+                    done += len(block)
+                    elapsed = time.time() - start
+                    speed = done / elapsed if elapsed else None
+                    _progress(
+                        hooks, 'downloading', downloaded_bytes=done, total_bytes=total, elapsed=elapsed, speed=speed,
+                        eta=(total - done) / speed if total and speed else None, **d
+                    )
+            finally:
+                response.close()
+
+            # A server ignoring the range sent everything at once
+            if not ranged or got == 0:
+                total = done
+                break
+
+    _progress(hooks, 'finished', downloaded_bytes=done, total_bytes=total, elapsed=time.time() - start, **d)
+
+
+class Transcoder:
+
+    """
+    Bounds the ffmpeg processes running at the same time, every transcode pipes the audio stream
+    straight into its process so only the final file is written. A transcode waits on the calling thread
+    for a free process, downloads that don't transcode are never held back by it
+    :param workers: ffmpeg processes running at the same time
+    """
+
+    def __init__(self, workers: int = TRANSCODE_WORKERS) -> None:
+        self.workers = max(1, workers)
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _semaphore(self) -> threading.Semaphore:
+        # Made on first use, workers may still be changed by the caller until then
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(self.workers)
+            return self._slots
+
+    def transcode(self, info: dict, fmt: dict, target: AudioTarget, path: str, progress_hooks=(),
+                  priority: int = BULK) -> str:
+        """
+        Transcodes on the calling thread once a process is free, returns the path of the final file
+        :param info: The info dict of the video
+        :param fmt: The audio format to read (from info['formats'])
+        :param target: What it is transcoded to
+        :param path: The final file
+        :param progress_hooks: Called with yt_dlp-like progress dicts
+        :param priority: Scheduler priority of the transfer
+        """
+        with self._semaphore():
+            return self._run(info, fmt, target, path, list(progress_hooks), priority)
+
+    def _run(self, info: dict, fmt: dict, target: AudioTarget, path: str, hooks: list, priority: int) -> str:
+        tmp = path + '.part'
+        piped = fmt.get('protocol', 'https') in STREAMABLE
+        source = 'pipe:0' if piped else fmt['url']
+        command = target.command(source, tmp, info.get('title'), None if piped else fmt.get('http_headers'))
+        d = {'filename': path, 'tmpfilename': tmp, 'info_dict': info}
+
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                command, stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=stderr
+            )
+            try:
+                with SCHEDULER.transfer(SCHEDULER.host([fmt]), priority) as transfer:
+                    if piped:
+                        try:
+                            _pipe(fmt, process.stdin, hooks + [transfer.hook], d)
+                        except BrokenPipeError:
+                            pass  # ffmpeg gave up, its exit code and stderr tell why
+                        finally:
+                            try:
+                                process.stdin.close()
+                            except BrokenPipeError:
+                                pass
+                    code = process.wait()
+            except BaseException:
+                process.kill()
+                process.wait()
+                _progress(hooks, 'error', **d)
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+            if code != 0:
+                stderr.seek(0)
+                _progress(hooks, 'error', **d)
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise RuntimeError(f"ffmpeg exited with {code}: {stderr.read().decode(errors='replace').strip()}")
+
+        if not piped:
+            _progress(hooks, 'finished', total_bytes=os.path.getsize(tmp), **d)
+        os.replace(tmp, path)
+        return path
+
+
+# Shared by every download of the process
+TRANSCODER = Transcoder()
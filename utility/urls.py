@@ -0,0 +1,125 @@
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+VIDEO = 'video'
+PLAYLIST = 'playlist'
+SEARCH = 'search'  # Not a YouTube url, treated as search keyword(s)
+
+# Compiled once, classify() is called for every line/url
+_HOST = re.compile(r'^(?:www\.|m\.|music\.)?(?:youtube\.com|youtube-nocookie\.com|youtu\.be)$', re.IGNORECASE)
+_SCHEME = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_LIST = re.compile(r'^[A-Za-z0-9_-]+$')
+_PATH_ID = re.compile(r'^/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})(?:[/?#]|$)')
+_TIME = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+
+
+class Url:
+
+    """
+    A classified input line
+    :param kind: VIDEO, PLAYLIST (may have a video_id too, e.g. watch?v=...&list=...) or SEARCH
+    :param text: The line as it was given (stripped)
+    """
+
+    __slots__ = (
+        'kind',
+        'text',
+        'video_id',
+        'playlist_id',
+        'start'
+    )
+
+    def __init__(self, kind: str, text: str, video_id: str = None, playlist_id: str = None, start: int = None) -> None:
+        self.kind = kind
+        self.text = text
+        self.video_id = video_id
+        self.playlist_id = playlist_id
+        self.start = start  # Seconds of a t=/start= timestamp
+
+    @property
+    def url(self) -> Optional[str]:
+        """The canonical url, None for a search"""
+        if self.kind == PLAYLIST:
+            return f"https://www.youtube.com/playlist?list={self.playlist_id}"
+        if self.kind == VIDEO:
+            return f"https://www.youtube.com/watch?v={self.video_id}"
+        return None
+
+    @property
+    def key(self) -> str:
+        """Identifies the item, two lines with the same key are the same download"""
+        if self.kind == PLAYLIST:
+            return f"playlist:{self.playlist_id}"
+        if self.kind == VIDEO:
+            return f"video:{self.video_id}"
+        return f"search:{' '.join(self.text.lower().split())}"
+
+    def __repr__(self):
+        return f"Url({self.key}{f', start={self.start}' if self.start else ''})"
+
+
+def _seconds(value: str) -> Optional[int]:
+    match = _TIME.match(value or '')
+    if not match or not any(match.groups()):
+        return None
+    h, m, s = (int(g or 0) for g in match.groups())
+    return h * 3600 + m * 60 + s
+
+
+def _classify(text: str) -> Url:
+    text = (text or '').strip()
+    search = Url(SEARCH, text)
+    if not text or ' ' in text:
+        return search
+
+    parts = urlsplit(text if _SCHEME.match(text) else '//' + text)
+    if parts.scheme not in ('', 'http', 'https') or not _HOST.match(parts.hostname or ''):
+        return search
+
+    query = parse_qs(parts.query)
+    first = {k: v[0] for k, v in query.items() if v}
+
+    video_id = None
+    if parts.hostname.lower().endswith('youtu.be'):
+        candidate = parts.path.strip('/').split('/')[0]
+        video_id = candidate if _ID.match(candidate) else None
+    elif parts.path.rstrip('/') == '/watch':
+        video_id = first.get('v') if _ID.match(first.get('v', '')) else None
+    else:
+        match = _PATH_ID.match(parts.path)
+        video_id = match.group(1) if match else None
+
+    playlist_id = first.get('list') if _LIST.match(first.get('list', '')) else None
+    # Fragment timestamps (#t=1m2s) count too
+    start = _seconds(first.get('t') or first.get('start') or parse_qs(parts.fragment).get('t', [None])[0])
+
+    if playlist_id:
+        return Url(PLAYLIST, text, video_id, playlist_id, start)
+    if video_id:
+        return Url(VIDEO, text, video_id, None, start)
+    return search
+
+
+@lru_cache(maxsize=4096)
+def classify(text: str) -> Url:
+    """Classifies one line: a video url, a playlist url or search keyword(s)"""
+    return _classify(text)
+
+
+def classify_many(lines: Iterable[str]) -> list[Url]:
+    """
+    Classifies many lines in one pass, drops empty lines and duplicates (same video, playlist or search)
+    The first occurrence of every item is kept, in input order
+    """
+    seen = set()
+    result = []
+    for line in dict.fromkeys(lines):  # Identical lines are only parsed once
+        url = _classify(line)
+        if not url.text or url.key in seen:
+            continue
+        seen.add(url.key)
+        result.append(url)
+    return result